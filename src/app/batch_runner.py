@@ -0,0 +1,157 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+
+from langchain_groq import ChatGroq
+
+from app.commute_invoice_extractor import CommuteExtractor
+from app.meal_invoice_extractor import MealExtractor
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.FileUtils import FileUtils
+from commons.client_address_registry import ClientAddressRegistry
+from commons.llm_cache import LLMCache
+from commons.metrics import Metrics
+from commons.model_router import ModelRouter
+from commons.ocr_cache import OcrCache
+from commons.ocr_pool import OcrPool
+
+## Run command : python src/app/batch_runner.py [resources_dir] [--full]
+
+# resources sub-folder → (extractor, system prompt)
+CATEGORIES = {
+    "commute": (CommuteExtractor, "src/prompt/system_prompt_cab.txt"),
+    "meal": (MealExtractor, "src/prompt/system_meal_prompt.txt"),
+}
+
+
+class BatchRunner:
+    """
+    Extracts every employee folder under resources/commute and
+    resources/meal in one process.
+
+    The OCR pool, the ChatGroq client (and with it its HTTP connection
+    pool), the LLM/OCR caches and the client address registry are set up
+    once and handed to every extractor. A folder that fails is reported and skipped; the
+    rest of the batch carries on. Pass llm to use another chat model than
+    ChatGroq (e.g. the benchmark's stub).
+    """
+
+    def __init__(self, resources_dir="resources", incremental=None, llm=None):
+        self.resources_dir = resources_dir
+        self.incremental = incremental
+        self.llm = llm
+        self.results = []
+
+    def find_folders(self):
+        """
+        Returns (category, folder_path) for every employee folder whose
+        name FileUtils.extract_info_from_foldername understands.
+        """
+        folders = []
+        for category in CATEGORIES:
+            category_dir = os.path.join(self.resources_dir, category)
+            if not os.path.isdir(category_dir):
+                continue
+            for name in sorted(os.listdir(category_dir)):
+                folder_path = os.path.join(category_dir, name)
+                if not os.path.isdir(folder_path):
+                    continue
+                try:
+                    FileUtils.extract_info_from_foldername(folder_path)
+                except (IndexError, ValueError):
+                    print(f"⚠️ Skipping {folder_path}: not <emp_id>_<name>_<month>_<client>")
+                    continue
+                folders.append((category, folder_path))
+        return folders
+
+    def run_folder(self, category, folder_path, llm, ocr_pool, client_addresses):
+        extractor_class, system_prompt_path = CATEGORIES[category]
+        kwargs = {"client_addresses": client_addresses} if extractor_class is CommuteExtractor else {}
+        extractor = extractor_class(folder_path, system_prompt_path, self.incremental,
+                                    llm=llm, ocr_pool=ocr_pool, **kwargs)
+        extractor.run()
+        if extractor.error is not None:
+            raise extractor.error
+        # receipts of failed LLM batches are retried by the next incremental run
+        pending = sum(len(chunk) for chunk in extractor.batcher.failed_chunks)
+        return len(extractor.receipts), pending
+
+    def run(self):
+        folders = self.find_folders()
+        print(f"📦 {len(folders)} employee folders under {self.resources_dir}")
+
+        llm = self.llm or ChatGroq(
+            model=config[Co.LLM][Co.MODEL],
+            temperature=config[Co.LLM][Co.TEMPERATURE]
+        )
+        client_addresses = ClientAddressRegistry.default()
+
+        workers = config.get(Co.OCR, {}).get(Co.WORKERS, 1)
+        ocr_pool = OcrPool() if workers != 1 else None
+
+        started = time.perf_counter()
+        self.results = []
+        try:
+            for number, (category, folder_path) in enumerate(folders, start=1):
+                folder_started = time.perf_counter()
+                result = {"category": category, "folder": folder_path, "receipts": 0, "pending": 0, "status": "ok"}
+                try:
+                    result["receipts"], result["pending"] = self.run_folder(
+                        category, folder_path, llm, ocr_pool, client_addresses)
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = f"{type(e).__name__}: {e}"
+                result["seconds"] = time.perf_counter() - folder_started
+                self.results.append(result)
+
+                elapsed = time.perf_counter() - started
+                done = sum(r["receipts"] for r in self.results)
+                print(f"[{number}/{len(folders)}] {'✔' if result['status'] == 'ok' else '❌'} "
+                      f"{category}/{os.path.basename(folder_path)}: {result['receipts']} receipts in "
+                      f"{result['seconds']:.1f}s · {done / elapsed if elapsed else 0.0:.2f} receipts/s overall"
+                      + (f" · {result['pending']} left pending" if result["pending"] else "")
+                      + (f" · {result['error']}" if "error" in result else ""))
+        finally:
+            if ocr_pool is not None:
+                ocr_pool.close()
+
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed):
+        failed = [r for r in self.results if r["status"] != "ok"]
+        receipts = sum(r["receipts"] for r in self.results)
+        summary = {
+            "folders": len(self.results),
+            "failed": len(failed),
+            "receipts": receipts,
+            "pending": sum(r["pending"] for r in self.results),
+            "seconds": elapsed,
+            "receipts_per_second": receipts / elapsed if elapsed else 0.0,
+            "ocr_cache": OcrCache.default().stats(),
+            "llm_cache": LLMCache.default().stats()
+        }
+        routing = ModelRouter.totals()
+        if routing:
+            summary["model_routing"] = routing
+        print(f"\n📊 Batch summary: {json.dumps(summary, indent=2)}")
+        for r in failed:
+            print(f"❌ {r['category']}/{os.path.basename(r['folder'])}: {r['error']}")
+        return summary
+
+
+# ------------------------
+# Script Entry Point
+# ------------------------
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    resources_dir = args[0] if args else "resources"
+    incremental = False if "--full" in sys.argv[1:] else None
+
+    summary = BatchRunner(resources_dir, incremental).run()
+    Metrics.default().export()
+    sys.exit(1 if summary["failed"] else 0)
@@ -0,0 +1,148 @@
+import numpy as np
+
+# categories decided per day (one group per date with valid bills); the
+# rest get one group per employee and month
+DAILY_CATEGORIES = ("meal",)
+
+
+class GroupAggregator:
+    """
+    Builds the decision groups (groups_data) for a month of bills.
+
+    The bills are read once into columns: employee, category and date as
+    interned int codes, is_valid, amount and the bill id. Group keys,
+    daily and monthly totals and the valid/invalid id lists then come from
+    np.unique / np.bincount / a stable argsort instead of rescanning each
+    employee's bills per date. bincount adds in bill order, so totals are
+    bit-for-bit what the per-bill loop produced, and the groups come out in
+    the same order: employees as given, categories and dates by first
+    appearance.
+    """
+
+    def __init__(self, bills_map):
+        """
+        bills_map: {"<emp_id>_<emp_name>": [bill, ...]}
+        """
+        self.employees = list(bills_map)
+        bills = [b for emp_bills in bills_map.values() for b in emp_bills]
+
+        # interned codes in order of first appearance
+        category_codes, date_codes = {}, {}
+        self.employee = np.repeat(np.arange(len(self.employees), dtype=np.int64),
+                                  [len(emp_bills) for emp_bills in bills_map.values()])
+        self.category = np.array([category_codes.setdefault(b.get("category", "unknown"), len(category_codes))
+                                  for b in bills], dtype=np.int64)
+        self.date = np.array([date_codes.setdefault(b.get("date"), len(date_codes)) for b in bills], dtype=np.int64)
+        valid = [bool(b.get("validation", {}).get("is_valid")) for b in bills]
+        self.valid = np.array(valid, dtype=bool)
+        # only valid bills are totalled (an invalid one may carry an unparsable amount)
+        self.amount = np.array([float(b.get("amount", 0) or 0) if v else 0.0 for b, v in zip(bills, valid)],
+                               dtype=np.float64)
+        self.ids = [b.get("id") for b in bills]
+        self.categories = list(category_codes)
+        self.dates = list(date_codes)
+
+    # ------------------------
+    # Helpers
+    # ------------------------
+    @staticmethod
+    def _first_seen(keys):
+        """
+        (unique keys in order of first appearance, inverse codes into that order)
+        """
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(len(unique), dtype=np.int64)
+        rank[order] = np.arange(len(unique))
+        return unique[order], rank[inverse.reshape(-1)]
+
+    def _id_lists(self, codes, mask, count):
+        """
+        Bill ids of the mask rows grouped by codes (0..count-1), each list
+        in bill order.
+        """
+        if not count:
+            return []
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(codes[rows], kind="stable")]
+        ids = [self.ids[row] for row in rows.tolist()]
+        ends = np.cumsum(np.bincount(codes[rows], minlength=count)).tolist()
+        return [ids[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+    # ------------------------
+    # Groups
+    # ------------------------
+    def groups(self):
+        if not len(self.employee):
+            return []
+        category_count, date_count = len(self.categories), len(self.dates)
+
+        # employee/category groups: employee order, then category by first appearance
+        group_keys, group = self._first_seen(self.employee * category_count + self.category)
+        group_count = len(group_keys)
+        valid_count = np.bincount(group[self.valid], minlength=group_count)
+        monthly_total = np.bincount(group[self.valid], weights=self.amount[self.valid], minlength=group_count)
+
+        daily_category = np.isin(group_keys % category_count,
+                                 [code for code, name in enumerate(self.categories) if name in DAILY_CATEGORIES])
+        daily_group = daily_category & (valid_count > 0)
+
+        # date groups: every (group, date) that has a valid bill of a daily group
+        day_key = group * date_count + self.date
+        day_rows = self.valid & daily_group[group]
+        day_keys, day_of_row = self._first_seen(day_key[day_rows])
+        day_count = len(day_keys)
+        day_total = np.bincount(day_of_row, weights=self.amount[day_rows], minlength=day_count)
+        day_code = np.full(len(self.employee), -1, dtype=np.int64)
+        day_code[day_rows] = day_of_row
+        # invalid bills join their date's group when it has one (else they are left out)
+        invalid_rows = np.flatnonzero(~self.valid & daily_group[group])
+        if day_count:
+            sorter = np.argsort(day_keys)
+            position = np.searchsorted(day_keys, day_key[invalid_rows], sorter=sorter)
+            candidate = sorter[np.minimum(position, day_count - 1)]
+            found = day_keys[candidate] == day_key[invalid_rows]
+            day_code[invalid_rows[found]] = candidate[found]
+
+        day_valid_ids = self._id_lists(day_code, day_rows, day_count)
+        day_invalid_ids = self._id_lists(day_code, (day_code >= 0) & ~self.valid, day_count)
+        month_valid_ids = self._id_lists(group, self.valid & ~daily_group[group], group_count)
+        month_invalid_ids = self._id_lists(group, ~self.valid & ~daily_group[group], group_count)
+
+        day_group = (day_keys // date_count).tolist() if day_count else []
+        day_date = (day_keys % date_count).tolist() if day_count else []
+        day_total = day_total.tolist()
+        days_of_group = {}
+        for day, g in enumerate(day_group):
+            days_of_group.setdefault(g, []).append(day)
+
+        groups_data = []
+        for g, (key, daily, valid_bills, total) in enumerate(zip(
+                group_keys.tolist(), daily_group.tolist(), valid_count.tolist(), monthly_total.tolist())):
+            emp_id, emp_name = self.employees[key // category_count].split("_", 1)
+            category = self.categories[key % category_count]
+            if daily:
+                for day in days_of_group[g]:
+                    groups_data.append({
+                        "employee_id": emp_id,
+                        "employee_name": emp_name,
+                        "category": category,
+                        "date": self.dates[day_date[day]],
+                        "valid_bills": day_valid_ids[day],
+                        "invalid_bills": day_invalid_ids[day],
+                        "daily_total": day_total[day],
+                        "monthly_total": None
+                    })
+            else:
+                groups_data.append({
+                    "employee_id": emp_id,
+                    "employee_name": emp_name,
+                    "category": category,
+                    "date": None,
+                    "valid_bills": month_valid_ids[g],
+                    "invalid_bills": month_invalid_ids[g],
+                    "daily_total": None,
+                    # sum() of no bills is the int 0
+                    "monthly_total": total if valid_bills else 0
+                })
+        return groups_data
@@ -0,0 +1,160 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.llm_batching import LLMBatcher
+from commons.llm_cache import REFRESH, LLMCache
+
+
+class ShardedDecisionRunner:
+    """
+    Runs LLM decisions in shards instead of one prompt holding every group.
+
+    Groups are kept together per employee and employees are packed into
+    shards of at most max_groups groups / max_tokens estimated prompt
+    tokens (an employee bigger than that is split). Every shard carries
+    the policy once, shards run on a bounded thread pool, and a shard whose
+    call fails or whose answer does not parse into one decision per group
+    is retried on its own. Decisions come back aligned with the input
+    groups; a shard that still fails leaves None for its groups.
+    """
+
+    def __init__(self, chain, system_prompt, policy, max_groups=None, max_tokens=None,
+                 max_concurrency=None, retries=None):
+        decision_config = config.get(Co.DECISION, {})
+        self.chain = chain
+        self.system_prompt = system_prompt
+        self.policy = policy
+        self.max_groups = max_groups or decision_config.get(Co.SHARD_MAX_GROUPS, 20)
+        self.max_tokens = max_tokens or decision_config.get(Co.SHARD_MAX_TOKENS, 6000)
+        self.max_concurrency = max_concurrency or decision_config.get(Co.MAX_CONCURRENCY, 4)
+        self.retries = decision_config.get(Co.RETRIES, 2) if retries is None else retries
+        self.shard_stats = []
+
+    # ------------------------
+    # Sharding
+    # ------------------------
+    def shard(self, indexed_groups):
+        """
+        indexed_groups: list of (index, group). Returns a list of shards,
+        each a list of (index, group).
+        """
+        by_employee = {}
+        for index, group in indexed_groups:
+            by_employee.setdefault(group.get("employee_id"), []).append((index, group))
+
+        overhead = LLMBatcher.estimate_tokens(self.system_prompt) + LLMBatcher.estimate_tokens(self.policy)
+        budget = max(1, self.max_tokens - overhead)
+
+        shards = []
+        shard, shard_tokens = [], 0
+        for employee_groups in by_employee.values():
+            tokens = sum(LLMBatcher.estimate_tokens(group) for _, group in employee_groups)
+            if shard and (len(shard) + len(employee_groups) > self.max_groups or shard_tokens + tokens > budget):
+                shards.append(shard)
+                shard, shard_tokens = [], 0
+            for item in employee_groups:
+                item_tokens = LLMBatcher.estimate_tokens(item[1])
+                if shard and (len(shard) >= self.max_groups or shard_tokens + item_tokens > budget):
+                    shards.append(shard)
+                    shard, shard_tokens = [], 0
+                shard.append(item)
+                shard_tokens += item_tokens
+        if shard:
+            shards.append(shard)
+        return shards
+
+    # ------------------------
+    # Calls
+    # ------------------------
+    @staticmethod
+    def _usage(message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+    def _run_shard(self, shard_no, shard):
+        groups = [group for _, group in shard]
+        user_prompt = json.dumps({"policy": self.policy, "groups": groups}, indent=2)
+        stats = {
+            "shard": shard_no,
+            "employees": len({group.get("employee_id") for group in groups}),
+            "groups": len(groups),
+            "attempts": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "status": "failed"
+        }
+        started = time.perf_counter()
+        decisions = None
+
+        for attempt in range(self.retries + 1):
+            stats["attempts"] += 1
+            message = None
+            try:
+                # a retry must not get the same cached answer back
+                message = self.chain.invoke({
+                    "system_prompt": self.system_prompt,
+                    "user_prompt": user_prompt
+                }, config={"configurable": {REFRESH: attempt > 0}})
+                input_tokens, output_tokens = self._usage(message)
+                stats["input_tokens"] += input_tokens
+                stats["output_tokens"] += output_tokens
+
+                parsed = json.loads(message.content)
+                if not isinstance(parsed, list) or len(parsed) != len(groups):
+                    raise ValueError(f"expected {len(groups)} decisions, got "
+                                     f"{len(parsed) if isinstance(parsed, list) else type(parsed).__name__}")
+                decisions = parsed
+                stats["status"] = "ok"
+                break
+            except Exception as e:
+                if message is not None:
+                    # an unusable answer must not be replayed from the cache
+                    LLMCache.default().discard(message)
+                stats["error"] = str(e)
+                print(f"⚠️ Decision shard {shard_no} attempt {attempt + 1} failed: {e}")
+                if attempt < self.retries:
+                    time.sleep(2 ** attempt)
+
+        stats["seconds"] = time.perf_counter() - started
+        if decisions is not None:
+            stats.pop("error", None)
+        return decisions, stats
+
+    def run(self, groups, indexes=None):
+        """
+        Decides groups[i] for every i in indexes (all groups by default).
+        Returns a list aligned with groups holding the decision or None.
+        """
+        indexes = list(range(len(groups))) if indexes is None else indexes
+        shards = self.shard([(i, groups[i]) for i in indexes])
+        print(f"🧩 {len(indexes)} groups in {len(shards)} decision shards "
+              f"(≤{self.max_groups} groups, {self.max_concurrency} concurrent)")
+
+        decisions = [None] * len(groups)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = list(executor.map(self._run_shard, range(len(shards)), shards))
+
+        self.shard_stats = []
+        for shard, (shard_decisions, stats) in zip(shards, results):
+            self.shard_stats.append(stats)
+            if shard_decisions is None:
+                continue
+            for (index, _), decision in zip(shard, shard_decisions):
+                decisions[index] = decision
+        return decisions
+
+    def report(self):
+        for stats in self.shard_stats:
+            print(f"  shard {stats['shard']}: {stats['status']} · {stats['groups']} groups · "
+                  f"{stats['attempts']} attempt(s) · {stats['seconds']:.2f}s · "
+                  f"{stats['input_tokens']} in / {stats['output_tokens']} out tokens")
+        return {
+            "shards": len(self.shard_stats),
+            "failed": sum(1 for stats in self.shard_stats if stats["status"] != "ok"),
+            "input_tokens": sum(stats["input_tokens"] for stats in self.shard_stats),
+            "output_tokens": sum(stats["output_tokens"] for stats in self.shard_stats),
+            "max_seconds": max((stats["seconds"] for stats in self.shard_stats), default=0.0)
+        }
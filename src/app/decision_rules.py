@@ -0,0 +1,123 @@
+import math
+
+APPROVE = "APPROVE"
+REJECT = "REJECT"
+
+# category → (policy section, limit key, total field in the group, period unit)
+CATEGORY_RULES = {
+    "cab": ("client_location_allowance", "limit", "monthly_total", "month"),
+    "fuel2": ("fuel_reimbursement_two_wheeler", "max_per_month", "monthly_total", "month"),
+    "fuel4": ("fuel_reimbursement_four_wheeler", "max_per_month", "monthly_total", "month"),
+    "meal": ("meal_allowance", "limit", "daily_total", "day"),
+}
+
+
+class Rule:
+    def __init__(self, category, section, limit, total_field, period):
+        self.category = category
+        self.section = section
+        self.limit = limit
+        self.total_field = total_field
+        self.period = period
+
+    @property
+    def label(self):
+        return self.section.replace("_", " ")
+
+
+class PolicyRuleEngine:
+    """
+    Compiles policy.json into per-category limit rules and decides groups
+    locally, in the same JSON shape the decision prompt asks the LLM for.
+
+    A rule is only compiled when the policy has a numeric limit in the unit
+    the category is checked against (per month for cab/fuel, per day for
+    meal). Groups without valid bills are rejected; groups without a usable
+    rule, or with valid bills but no numeric total, are returned as
+    ambiguous so the caller can send them to the LLM.
+    """
+
+    def __init__(self, policy: dict):
+        self.policy = policy
+        self.rules = self.compile(policy)
+
+    @staticmethod
+    def compile(policy: dict) -> dict:
+        rules = {}
+        for category, (section, limit_key, total_field, period) in CATEGORY_RULES.items():
+            entry = policy.get(section)
+            if not isinstance(entry, dict):
+                continue
+            limit = entry.get(limit_key)
+            if isinstance(limit, bool) or not isinstance(limit, (int, float)) or math.isnan(limit):
+                continue
+            # max_per_month is monthly by name; plain limits say so in "unit"
+            if limit_key == "limit" and f"per {period}" not in str(entry.get("unit", "")).lower():
+                continue
+            rules[category] = Rule(category, section, float(limit), total_field, period)
+        return rules
+
+    @staticmethod
+    def _amount(value):
+        return f"{float(value)}"
+
+    def decide(self, group: dict):
+        """
+        Returns the decision dict for a group, or None when it is ambiguous.
+        """
+        rule = self.rules.get(group.get("category"))
+        if rule is None:
+            return None
+
+        decision = {
+            "decision": APPROVE,
+            "employee_id": group.get("employee_id"),
+            "employee_name": group.get("employee_name"),
+            "category": group.get("category"),
+            "valid_bill_ids": group.get("valid_bills", []),
+            "invalid_bill_ids": group.get("invalid_bills", []),
+            "reasons": []
+        }
+
+        # a group without valid bills has no total (daily_total None) and
+        # is rejected whatever the limit
+        total = group.get(rule.total_field) if group.get("valid_bills") else 0
+        if isinstance(total, bool) or not isinstance(total, (int, float)):
+            return None
+
+        if total == 0:
+            decision["decision"] = REJECT
+            decision["reasons"].append(f"No valid bills for the {rule.period}.")
+            return decision
+
+        if total < rule.limit:
+            comparison = "less than"
+        elif total == rule.limit:
+            comparison = "equal to"
+        else:
+            comparison = "greater than"
+            decision["decision"] = REJECT
+
+        if rule.period == "day":
+            subject = f"the daily total of {self._amount(total)}"
+            limit_text = f"the policy {rule.label} limit of {rule.limit:g} INR per day"
+        else:
+            subject = f"the month of {self._amount(total)}"
+            limit_text = f"the {rule.label} limit of {rule.limit:g} INR per month"
+        decision["reasons"].append(f"Total valid bill amount for {subject} is {comparison} {limit_text}.")
+        return decision
+
+    def evaluate(self, groups: list):
+        """
+        Returns (decisions, ambiguous) where decisions has one entry per
+        group (None for ambiguous ones) and ambiguous lists the indexes of
+        the groups that need the LLM.
+        """
+        decisions = []
+        ambiguous = []
+        for index, group in enumerate(groups):
+            decision = self.decide(group)
+            decisions.append(decision)
+            if decision is None:
+                ambiguous.append(index)
+        return decisions, ambiguous
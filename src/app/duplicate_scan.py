@@ -0,0 +1,52 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.duplicate_index import DuplicateIndex
+from commons.FileUtils import FileUtils
+
+## Run command : python src/app/duplicate_scan.py [resources_dir]
+## Registers every extractor output of the configured model in the duplicate
+## index (folders in name order) and lists the receipts flagged as re-claims.
+
+# output folder → (category, resources sub-folder)
+OUTPUTS = {
+    "commute": ("cab", "commute"),
+    "meal": ("meal", "meal"),
+}
+
+
+def receipt_paths(resources_dir, resources_category, folder_name):
+    folder_path = os.path.join(resources_dir, resources_category, folder_name)
+    if not os.path.isdir(folder_path):
+        return {}
+    return dict(FileUtils.list_receipt_files(folder_path))
+
+
+if __name__ == "__main__":
+    resources_dir = sys.argv[1] if len(sys.argv) > 1 else "resources"
+    index = DuplicateIndex.default()
+
+    flagged = []
+    for output_category, (category, resources_category) in OUTPUTS.items():
+        output_dir = os.path.join("src/model_output", output_category, config[Co.LLM][Co.MODEL])
+        if not os.path.isdir(output_dir):
+            continue
+        for folder_name in sorted(os.listdir(output_dir)):
+            output_path = os.path.join(output_dir, folder_name)
+            if not os.path.isfile(output_path):
+                continue
+            records = FileUtils.load_json_from_file(output_path)
+            index.flag(category, records, receipt_paths(resources_dir, resources_category, folder_name))
+            flagged.extend(
+                {"category": category, "folder": folder_name, "filename": r.get("filename"), "id": r.get("id"),
+                 "duplicate_of": r["validation"]["duplicate_of"]}
+                for r in records if r["validation"]["is_duplicate"]
+            )
+
+    print(json.dumps(flagged, indent=2, ensure_ascii=False))
+    print(f"♊ {len(flagged)} duplicate claims")
@@ -0,0 +1,168 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.FileUtils import FileUtils
+from commons.receipt_segmenter import source_name
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux FICLONE ioctl: copy-on-write clone (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+LINK = "link"
+COPY = "copy"
+
+# bill category → resources / model_output folder
+CATEGORY_FOLDERS = {"cab": "commute"}
+
+
+class FilePlacer:
+    """
+    Puts every receipt file into valid_bills/ or invalid_bills/ under
+    src/model_output/<category>/<model>/<emp_id>_<emp_name>/.
+
+    Bills carry emp_id/emp_name/emp_month/client, which name their
+    resources folder exactly, and their filename (or receipt unit id) is
+    the file's stem, so each folder is listed once and every bill finds its
+    file with a dict lookup. Files are hardlinked, else reflinked, else
+    copied (mode: copy always copies), one employee per worker thread. A
+    file already in place (same inode, or same size and mtime) is skipped,
+    so reruns only touch what changed.
+    """
+
+    def __init__(self, output_root, resources_root, model_name, mode=None, workers=None):
+        placement_config = config.get(Co.PLACEMENT, {})
+        self.output_root = output_root
+        self.resources_root = resources_root
+        self.model_name = model_name
+        self.mode = mode or placement_config.get(Co.MODE, LINK)
+        self.workers = workers or placement_config.get(Co.WORKERS, 8)
+        self._lock = threading.Lock()
+        self.stats = {"linked": 0, "reflinked": 0, "copied": 0, "skipped": 0, "missing": 0}
+
+    # ------------------------
+    # Index
+    # ------------------------
+    def resources_folder(self, category, bill):
+        """
+        The resources folder a bill was extracted from: the exact
+        <emp_id>_<emp_name>_<month>_<client> folder, else the first one
+        starting with the emp_id (as the old lookup did).
+        """
+        category_dir = os.path.join(self.resources_root, category)
+        name = f"{bill.get('emp_id')}_{bill.get('emp_name')}_{bill.get('emp_month')}_{bill.get('client')}"
+        if os.path.isdir(os.path.join(category_dir, name)):
+            return os.path.join(category_dir, name)
+        if not os.path.isdir(category_dir):
+            return None
+        for folder_name in sorted(os.listdir(category_dir)):
+            if folder_name.startswith(str(bill.get("emp_id"))):
+                return os.path.join(category_dir, folder_name)
+        return None
+
+    def plan(self, bills):
+        """
+        {(category, emp_id, emp_name): [(source_path, destination_dir), ...]}
+        for the bills, one entry per file and destination.
+        """
+        folder_index = {}
+        plans = {}
+        for bill in bills:
+            category = CATEGORY_FOLDERS.get(bill.get("category"), bill.get("category"))
+            folder = self.resources_folder(category, bill)
+            if folder is None:
+                print(f"⚠️ No {category} source folder for {bill.get('emp_id')}_{bill.get('emp_name')}")
+                self.stats["missing"] += 1
+                continue
+            if folder not in folder_index:
+                folder_index[folder] = dict(FileUtils.list_receipt_files(folder))
+            source_path = folder_index[folder].get(source_name(bill.get("filename") or ""))
+            if source_path is None:
+                print(f"⚠️ {bill.get('filename')} not found in {folder}")
+                self.stats["missing"] += 1
+                continue
+
+            kind = "valid_bills" if bill.get("validation", {}).get("is_valid") else "invalid_bills"
+            employee = f"{bill.get('emp_id')}_{bill.get('emp_name')}"
+            destination_dir = os.path.join(self.output_root, category, self.model_name, kind, employee)
+            entries = plans.setdefault((category, bill.get("emp_id"), bill.get("emp_name")), [])
+            if (source_path, destination_dir) not in entries:
+                entries.append((source_path, destination_dir))
+        return plans
+
+    # ------------------------
+    # Placement
+    # ------------------------
+    @staticmethod
+    def _in_place(source_path, destination_path):
+        try:
+            if os.path.samefile(source_path, destination_path):
+                return True
+            source, destination = os.stat(source_path), os.stat(destination_path)
+        except FileNotFoundError:
+            return False
+        return source.st_size == destination.st_size and int(source.st_mtime) == int(destination.st_mtime)
+
+    @staticmethod
+    def _reflink(source_path, destination_path):
+        if fcntl is None:
+            return False
+        try:
+            with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+                fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        except OSError:
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            return False
+        shutil.copystat(source_path, destination_path)
+        return True
+
+    def place_file(self, source_path, destination_dir):
+        destination_path = os.path.join(destination_dir, os.path.basename(source_path))
+        if self._in_place(source_path, destination_path):
+            return "skipped"
+        if os.path.lexists(destination_path):
+            os.remove(destination_path)
+
+        if self.mode == LINK:
+            try:
+                os.link(source_path, destination_path)
+                return "linked"
+            except OSError:
+                # other filesystem, or links not allowed
+                pass
+            if self._reflink(source_path, destination_path):
+                return "reflinked"
+        shutil.copy2(source_path, destination_path)
+        return "copied"
+
+    def _place_employee(self, key, entries):
+        category, emp_id, emp_name = key
+        counts = {}
+        for source_path, destination_dir in entries:
+            os.makedirs(destination_dir, exist_ok=True)
+            result = self.place_file(source_path, destination_dir)
+            counts[result] = counts.get(result, 0) + 1
+        with self._lock:
+            for result, count in counts.items():
+                self.stats[result] += count
+        return (f"✅ Placed {category} files for {emp_id}_{emp_name}: "
+                + ", ".join(f"{count} {result}" for result, count in sorted(counts.items())))
+
+    def place(self, bills):
+        """
+        Places the files of all bills. Returns the counts per outcome.
+        """
+        plans = self.plan(bills)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self._place_employee, key, entries) for key, entries in plans.items()]:
+                print(future.result())
+        print(f"🗃 File placement: {self.stats}")
+        return self.stats
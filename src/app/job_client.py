@@ -0,0 +1,86 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+
+# only the queue: no langchain/cv2/fitz imports, so submitting is instant
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.job_queue import FAILED, JobQueue
+
+## Run command : python src/app/job_client.py folder <meal|commute> <folder> [--full] [--no-wait]
+##               python src/app/job_client.py batch [resources_dir] [--full] [--no-wait]
+##               python src/app/job_client.py decide [--emp_id=IIIPL-1000] [--category=meal|cab] [--month=oct] [--no-wait]
+##               python src/app/job_client.py wait <job_id> [<job_id> ...]
+##               python src/app/job_client.py status [<job_id> ...]
+## Jobs run in src/app/worker_daemon.py; start it first.
+
+
+def wait_for(queue, job_ids):
+    """
+    Waits for the jobs (and the folder jobs a batch job fans out to),
+    prints each one and returns True when none failed.
+    """
+    poll_seconds = config.get(Co.DAEMON, {}).get(Co.POLL_SECONDS, 0.5)
+    ok = True
+    pending = list(job_ids)
+    while pending:
+        jobs = queue.wait(pending, poll_seconds=poll_seconds)
+        pending = []
+        for job_id, job in zip(job_ids, jobs):
+            if job is None:
+                print(f"❓ job {job_id} not found")
+                ok = False
+                continue
+            ok = ok and job["status"] != FAILED
+            seconds = (job["finished_at"] or 0) - (job["started_at"] or job["finished_at"] or 0)
+            print(f"{'❌' if job['status'] == FAILED else '✅'} job {job['id']} {job['kind']} {job['status']}"
+                  f" in {seconds:.1f}s: {job['error'] or job['result']}")
+            pending.extend((job["result"] or {}).get("folder_jobs", []))
+        job_ids = pending
+    return ok
+
+
+def main(args):
+    options = dict(arg[2:].split("=", 1) for arg in args if arg.startswith("--") and "=" in arg)
+    flags = {arg for arg in args if arg.startswith("--") and "=" not in arg}
+    positional = [arg for arg in args if not arg.startswith("--")]
+    if not positional:
+        print("Usage: see the Run command lines at the top of src/app/job_client.py")
+        return 2
+
+    queue = JobQueue()
+    command, rest = positional[0], positional[1:]
+    if command == "folder" and len(rest) == 2:
+        category, folder = rest
+        job_ids = [queue.submit("folder", {"category": category, "folder": folder, "full": "--full" in flags},
+                                target=os.path.normpath(folder))]
+    elif command == "batch":
+        job_ids = [queue.submit("batch", {"resources_dir": rest[0] if rest else "resources",
+                                          "full": "--full" in flags})]
+    elif command == "decide":
+        # one decision run at a time: they place files into the same folders
+        job_ids = [queue.submit("decide", {key: options.get(key) for key in ("emp_id", "category", "month")},
+                                target="decide")]
+    elif command == "wait" and rest:
+        return 0 if wait_for(queue, [int(job_id) for job_id in rest]) else 1
+    elif command == "status":
+        if not rest:
+            print(f"📋 {queue.path}: {queue.counts()}")
+            return 0
+        for job_id in rest:
+            print(json.dumps(queue.get(int(job_id)), indent=2, ensure_ascii=False))
+        return 0
+    else:
+        print(f"❌ Unknown command: {' '.join(positional)}")
+        return 2
+
+    print(f"📨 Submitted job {', '.join(str(job_id) for job_id in job_ids)}")
+    if "--no-wait" in flags:
+        return 0
+    return 0 if wait_for(queue, job_ids) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -5,6 +5,7 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app.validate_commute_fields import ValidateCommuteFeilds
+from app.streaming_pipeline import StreamingPipeline
 
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
@@ -12,13 +13,22 @@ from langchain_groq import ChatGroq
 from commons.constants import Constants as Co
 from commons.config_reader import config
 from commons.FileUtils import FileUtils
-from entity.meal_extraction_schema import MealExtraction, MealExtractionList
+from commons.receipt_segmenter import source_name
+from commons.bill_store import BillStore
+from commons.duplicate_index import DuplicateIndex
+from commons.extraction_manifest import ExtractionManifest
+from commons.llm_batching import LLMBatcher
+from commons.llm_cache import LLMCache
+from commons.metrics import Metrics
+from commons.model_router import ModelRouter
+from commons.template_extractor import TemplateExtractor
+from entity.meal_extraction_schema import MealExtractionList
 
 ## Run command : python src/bill_extractor_tesseract.py D:/pycharm/admin_billdesk/resources/IIIPL-1011_smitha_oct_tesco D:\pycharm\admin_billdesk\src\prompt\system_prompt_cab.txt
 ## export api key via PS :$env:GROQ_API_KEY="API_KEY"
 
 class MealExtractor:
-    def __init__(self,input_folder,system_prompt_path):
+    def __init__(self,input_folder,system_prompt_path,incremental=None,llm=None,ocr_pool=None,stream=False):
         self.input_folder = input_folder
         self.system_prompt_path = system_prompt_path
         self.output_folder = "src/model_output/meal/" + config[Co.LLM][Co.MODEL] + "/"
@@ -26,7 +36,16 @@ class MealExtractor:
         self.category = {"category": "meal"}
         # Load receipts from folder
         # Should return a list of:  {"filename": "...", "text": "..."}
-        self.receipts = FileUtils.process_folder(self.input_folder)
+        self.output_path = self.output_folder + self.input_folder.split("/")[-1]
+        # Incremental runs only OCR/extract receipts added or changed since the
+        # last run; full runs extract everything and refresh the manifest
+        if incremental is None:
+            incremental = config.get(Co.EXTRACTION, {}).get(Co.INCREMENTAL, False)
+        self.manifest = ExtractionManifest.for_output(self.output_path)
+        self.pending_files = self.manifest.changed_files(FileUtils.list_receipt_files(self.input_folder),
+                                                         force=not incremental)
+        # streaming runs OCR file by file inside the pipeline instead
+        self.receipts = [] if stream else FileUtils.process_folder(self.input_folder, ocr_pool, self.pending_files)
         print("\n[Receipts loaded]")
         print(self.receipts)
 
@@ -35,8 +54,8 @@ class MealExtractor:
         print("\n[Loaded System Prompt]")
         print(self.system_prompt)
 
-        # Choose model and temperature
-        self.llm = ChatGroq(
+        # Choose model and temperature (the batch runner shares one client)
+        self.llm = llm or ChatGroq(
             model=config[Co.LLM][Co.MODEL],
             temperature=config[Co.LLM][Co.TEMPERATURE],
         )
@@ -57,8 +76,78 @@ class MealExtractor:
             )
         ])
 
-        # Final chain (Prompt → Model → Parser)
-        self.chain = self.prompt | self.llm | self.parser
+        # Final chain (Prompt → Model → Parser), model responses cached on disk;
+        # with llm.routing on, a small model answers first and this one only
+        # redoes the receipts it got wrong
+        self.router = ModelRouter(self.llm, self.prompt, self.parser, self.suspects)
+        if self.router.enabled:
+            self.chain = self.router.chain()
+        else:
+            # an answer that does not parse is dropped from the cache again
+            cache = LLMCache.default()
+            self.chain = self.prompt | cache.wrap(self.llm, self.prompt) \
+                | cache.parsed(Metrics.default().runnable("llm_parse", self.parser))
+
+        # Splits receipts into token-budgeted chunks run concurrently
+        self.batcher = LLMBatcher()
+
+        # Known receipt layouts are read directly, without the LLM
+        self.templates = TemplateExtractor("meal")
+
+    def llm_input(self, chunk):
+        return {
+            "system_prompt": self.system_prompt,
+            "receipts_json": chunk,
+            "format_instructions": self.parser.get_format_instructions()
+        }
+
+    def overhead_text(self):
+        # sent with every LLM batch, taken off the batch token budget
+        return self.system_prompt + self.parser.get_format_instructions()
+
+    def suspects(self, output_data):
+        """
+        {filename: [failed checks]} for small-model records whose validation
+        fails the way a misread does; the model router escalates them.
+        """
+        enriched = [
+            {**item.model_dump(), **self.employee_meta.to_dict(), **self.category}
+            for item in output_data
+        ]
+        validations = ValidateCommuteFeilds.validate_meals(enriched)
+        errors = ValidateCommuteFeilds.extraction_errors(
+            enriched, validations, self.router.suspect_name_score, self.router.suspect_address_score
+        )
+        suspects = {}
+        for item, found in zip(output_data, errors):
+            suspects.setdefault(item.filename, []).extend(found)
+        return suspects
+
+    def validate(self, output_data):
+        """
+        Enriches extracted records with the employee details and adds the
+        validation block. Returns the list of dicts that gets written out.
+        """
+        validated_results = [
+            {
+                **item.model_dump(),
+                **self.employee_meta.to_dict(),
+                **self.category
+            }
+            for item in output_data
+        ]
+
+        # one batch call for the whole list
+        with Metrics.default().span("validate"):
+            validations = ValidateCommuteFeilds.validate_meals(validated_results)
+        for enriched, validation in zip(validated_results, validations):
+            enriched["validation"] = validation
+
+        # receipts already claimed in this or another folder
+        DuplicateIndex.default().flag(
+            "meal", validated_results, dict(FileUtils.list_receipt_files(self.input_folder))
+        )
+        return validated_results
 
         # ------------------------
         # Run Extraction
@@ -66,31 +155,44 @@ class MealExtractor:
 
     def run(self):
         print("\n[Starting Extraction]\n")
+        self.error = None
+
+        if not self.receipts and not self.manifest.deleted:
+            self.manifest.save()
+            print("✔ No new or changed receipts, output is up to date")
+            return
 
         try:
-            result: MealExtraction = self.chain.invoke({
-                "system_prompt": self.system_prompt,
-                "receipts_json": self.receipts,
-                "format_instructions": self.parser.get_format_instructions()
-            })
-
-            output_data = result.root  # List[RideExtraction]
-            print("\n✔ Batch Extracted Successfully")
+            fast_records, llm_receipts = self.templates.extract(self.receipts)
+            print(f"⚡ Template fast path: {self.templates.stats()}")
+
+            llm_records = self.batcher.run(
+                self.chain,
+                llm_receipts,
+                self.llm_input,
+                overhead_text=self.overhead_text()
+            ) if llm_receipts else []
+            if llm_receipts and self.batcher.all_failed():
+                # nothing to write: keep the last output and fail the run
+                raise RuntimeError(f"all LLM batches failed ({self.batcher.failure_summary()})")
+            output_data = LLMBatcher.merge_in_order(fast_records + llm_records, self.receipts)
+            if llm_receipts and self.batcher.failed_chunks:
+                print(f"\n⚠️ Batch Extracted with failures: {self.batcher.failure_summary()}")
+            else:
+                print("\n✔ Batch Extracted Successfully")
+            if self.router.enabled:
+                print(f"🧭 Model routing: {self.router.report()}")
             print(output_data)
 
-            validated_results = []
-
-            for item in output_data:
-                enriched = {
-                    **item.model_dump(),
-                    **self.employee_meta.to_dict(),
-                    **self.category
-                }
-
-                validation = ValidateCommuteFeilds.validate_meal(enriched)
-                enriched["validation"] = validation
+            validated_results = self.validate(output_data)
 
-                validated_results.append(enriched)
+            # receipts of failed LLM batches stay pending for the next run
+            # (a file split into receipt units only counts once all of them made it)
+            failed = {source_name(name) for chunk in self.batcher.failed_chunks for receipt in chunk
+                      for name in receipt}
+            processed = [name for receipt in self.receipts for name in receipt if source_name(name) not in failed]
+            self.manifest.apply(processed, validated_results)
+            validated_results = self.manifest.records()
 
             json_output = json.dumps(
                 validated_results,
@@ -98,13 +200,24 @@ class MealExtractor:
                 ensure_ascii=False
             )
 
-            FileUtils.write_json_to_file(json_output, self.output_folder + self.input_folder.split("/")[-1])
+            FileUtils.write_json_to_file(json_output, self.output_path)
+            BillStore.default().write_output(self.output_path, validated_results)
+            self.manifest.save()
         except Exception as e:
+            self.error = e
             print(f"❌ Error during batch extraction: {e}")
 
 if __name__ == "__main__":
     input_folder = sys.argv[1]
     system_prompt_file_path = sys.argv[2]
+    incremental = False if "--full" in sys.argv[3:] else None
     print(system_prompt_file_path)
-    extractor = MealExtractor(input_folder, system_prompt_file_path)
-    extractor.run()
+    stream = "--stream" in sys.argv[3:]
+    extractor = MealExtractor(input_folder, system_prompt_file_path, incremental, stream=stream)
+    if stream:
+        StreamingPipeline(extractor).run()
+    else:
+        extractor.run()
+    Metrics.default().export()
+    if extractor.error is not None:
+        sys.exit(1)
@@ -1,11 +1,14 @@
+import json
 import os
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_groq import ChatGroq
 
 from commons.FileUtils import FileUtils
 from commons.config_reader import config
+from commons.llm_cache import LLMCache
 from commons.constants import Constants as Co
 
 
@@ -18,7 +21,8 @@ class PolicyExtractor:
     def run(self):
         # Step 1: Extract text from the PDF using existing OCR helper
         pdf_name = os.path.splitext(os.path.basename(self.input_pdf_path))[0]
-        ocr_text = FileUtils.get_ocr_text_from_file(pdf_name, self.input_pdf_path)
+        # the policy is one document, never split into receipt units
+        ocr_text = FileUtils.get_ocr_text_from_file(pdf_name, self.input_pdf_path, segment=False)
 
         # Step 2: Load the policy-specific system prompt for LLM
         system_prompt = FileUtils.load_text_file(self.system_prompt_path)
@@ -37,9 +41,12 @@ class PolicyExtractor:
             temperature=config[Co.LLM][Co.TEMPERATURE]
         )
 
-        parser = StrOutputParser()
+        # parsed in the chain, so an answer that is not JSON is dropped from
+        # the cache again instead of replayed
+        parser = StrOutputParser() | RunnableLambda(json.loads)
 
-        chain = prompt | llm | parser
+        cache = LLMCache.default()
+        chain = prompt | cache.wrap(llm, prompt) | cache.parsed(parser)
 
         output = chain.invoke({
             "system_prompt": system_prompt,
@@ -47,7 +54,7 @@ class PolicyExtractor:
         })
 
         # Step 4: Save the JSON output using existing helper
-        FileUtils.write_json_to_file(output, self.root_folder+"src/model_output/policy/"+model_name+"/policy.json")
+        FileUtils.write_json_to_file(json.dumps(output), self.root_folder+"src/model_output/policy/"+model_name+"/policy.json")
 
         print(f"✅ Policy JSON written to policy.json from: {self.input_pdf_path}")
 
@@ -0,0 +1,266 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.bill_store import BillStore
+from commons.FileUtils import FileUtils
+from commons.llm_batching import LLMBatcher
+from commons.metrics import Metrics, peak_rss_mb
+from commons.receipt_segmenter import source_name
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+
+    def to_dict(self):
+        return {"items": self.items, "busy_seconds": round(self.busy_seconds, 3), "errors": self.errors}
+
+
+class StreamingPipeline:
+    """
+    Runs an extractor (CommuteExtractor / MealExtractor built with
+    stream=True) as four concurrent stages joined by bounded queues:
+
+        OCR (ocr_workers threads) → LLM (template fast path, token-budgeted
+        micro-batches, max_concurrency threads) → validation → writer
+
+    A stage blocks when the queue after it is full, so at most queue_size
+    items wait between two stages whatever the folder size, and OCR text
+    does not pile up ahead of the LLM stage. The writer appends every
+    record to a JSONL file under pipeline.jsonl_dir as soon as it is
+    validated and hands it to the extractor's manifest, which moves its
+    OCR text to disk (see ExtractionManifest) and keeps the rest. When the
+    run ends the manifest's records are streamed, one at a time, into the
+    usual JSON output and the bill store, so memory stays flat whatever
+    the folder size.
+
+    LLM micro-batches that fail are retried with the cache bypassed, like
+    LLMBatcher.run. When every file failed the extractor's error is set,
+    and the script exits non-zero.
+    """
+
+    def __init__(self, extractor, ocr_workers=None, queue_size=None, batch_wait_seconds=None):
+        pipeline_config = config.get(Co.PIPELINE, {})
+        self.extractor = extractor
+        self.ocr_workers = ocr_workers or pipeline_config.get(Co.OCR_WORKERS, 2)
+        self.queue_size = queue_size or pipeline_config.get(Co.QUEUE_SIZE, 8)
+        self.batch_wait_seconds = batch_wait_seconds or pipeline_config.get(Co.BATCH_WAIT_SECONDS, 0.5)
+        # kept out of src/model_output, where every file is read as a bill list
+        relative = os.path.relpath(os.path.abspath(extractor.output_path), os.path.abspath("src/model_output"))
+        self.jsonl_path = os.path.join(pipeline_config.get(Co.JSONL_DIR, ".cache/stream"), relative + ".jsonl")
+        self.stats = {name: StageStats(name) for name in ("ocr", "llm", "validate", "write")}
+        self.failed_files = set()
+        self.processed_files = []
+        self._lock = threading.Lock()
+
+    # ------------------------
+    # Stage helpers
+    # ------------------------
+    def _worker_pool(self, name, handle, inbox, outbox, workers):
+        """
+        Starts workers threads that call handle(item) for every item of inbox
+        and put what it returns (a list) on outbox. The last worker to see
+        the end of inbox passes it on.
+        """
+        remaining = [workers]
+
+        def loop():
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    inbox.put(_DONE)
+                    with self._lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last:
+                        outbox.put(_DONE)
+                    return
+                started = time.perf_counter()
+                try:
+                    results = handle(item)
+                except Exception as e:
+                    with self._lock:
+                        self.stats[name].errors += 1
+                    print(f"❌ {name} stage: {e}")
+                    results = []
+                with self._lock:
+                    self.stats[name].busy_seconds += time.perf_counter() - started
+                    self.stats[name].items += 1
+                for result in results:
+                    outbox.put(result)
+
+        threads = [threading.Thread(target=loop, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    # ------------------------
+    # Stages
+    # ------------------------
+    def _ocr(self, file):
+        pdf_name, pdf_path = file
+        try:
+            texts = FileUtils.get_ocr_text_from_file(pdf_name, pdf_path)
+        except Exception:
+            with self._lock:
+                self.failed_files.add(pdf_name)
+            raise
+        # one item per receipt unit, so the units of a multi-receipt scan are
+        # batched like separate receipts
+        return [{unit_id: text} for unit_id, text in texts.items()]
+
+    def _batch(self, inbox, outbox):
+        """
+        Template fast path, then packs the remaining receipts into chunks of
+        at most the batcher's token budget. A chunk is also sent when no new
+        receipt arrived for batch_wait_seconds, so the LLM never idles
+        waiting for a full chunk.
+        """
+        batcher = self.extractor.batcher
+        budget = max(1, batcher.max_tokens - batcher.estimate_tokens(self.extractor.overhead_text()))
+        chunk, chunk_tokens = [], 0
+
+        while True:
+            try:
+                item = inbox.get(timeout=self.batch_wait_seconds)
+            except queue.Empty:
+                if chunk:
+                    outbox.put(chunk)
+                    chunk, chunk_tokens = [], 0
+                continue
+            if item is _DONE:
+                if chunk:
+                    outbox.put(chunk)
+                outbox.put(_DONE)
+                return
+
+            filename, text = next(iter(item.items()))
+            record = self.extractor.templates.match(filename, text) if self.extractor.templates.enabled else None
+            if record is not None:
+                self.extractor.templates.hits += 1
+                outbox.put(("fast", [filename], [record]))
+                continue
+            self.extractor.templates.misses += 1
+
+            tokens = batcher.estimate_tokens(item)
+            if chunk and chunk_tokens + tokens > budget:
+                outbox.put(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(item)
+            chunk_tokens += tokens
+
+    def _llm(self, item):
+        if isinstance(item, tuple):
+            return [item]
+        names = [name for receipt in item for name in receipt]
+        try:
+            result = self.extractor.batcher.invoke(self.extractor.chain, self.extractor.llm_input(item))
+        except Exception:
+            with self._lock:
+                self.failed_files.update(names)
+            raise
+        return [("llm", names, LLMBatcher.merge_in_order(result.root, item))]
+
+    def _validate(self, item):
+        _, names, records = item
+        try:
+            return [(names, self.extractor.validate(records))]
+        except Exception:
+            with self._lock:
+                self.failed_files.update(names)
+            raise
+
+    # ------------------------
+    # Run
+    # ------------------------
+    def run(self):
+        files = self.extractor.pending_files
+        manifest = self.extractor.manifest
+        self.extractor.error = None
+        if not files and not manifest.deleted:
+            manifest.save()
+            print("✔ No new or changed receipts, output is up to date")
+            return 0
+
+        started = time.perf_counter()
+        file_q = queue.Queue()
+        text_q = queue.Queue(self.queue_size)
+        chunk_q = queue.Queue(self.queue_size)
+        record_q = queue.Queue(self.queue_size)
+        write_q = queue.Queue(self.queue_size)
+        for file in files:
+            file_q.put(file)
+        file_q.put(_DONE)
+
+        threads = self._worker_pool("ocr", self._ocr, file_q, text_q, self.ocr_workers)
+        threads.append(threading.Thread(target=self._batch, args=(text_q, chunk_q), name="batch", daemon=True))
+        threads[-1].start()
+        threads += self._worker_pool("llm", self._llm, chunk_q, record_q, self.extractor.batcher.max_concurrency)
+        threads += self._worker_pool("validate", self._validate, record_q, write_q, 1)
+
+        os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+        written = 0
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            while True:
+                item = write_q.get()
+                if item is _DONE:
+                    break
+                write_started = time.perf_counter()
+                names, records = item
+                with Metrics.default().span("write_jsonl"):
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                # files whose OCR or LLM batch failed never get here and
+                # stay pending for the next run
+                manifest.apply(names, records)
+                self.processed_files.extend(names)
+                written += len(records)
+                self.stats["write"].items += len(records)
+                self.stats["write"].busy_seconds += time.perf_counter() - write_started
+                print(f"📝 {written} records written ({len(self.processed_files)} receipts, {len(files)} files)")
+
+        for thread in threads:
+            thread.join()
+        # a file split into receipt units whose other units did get through
+        manifest.revert(self.failed_files)
+
+        failed = {source_name(name) for name in self.failed_files}
+        if files and failed >= {name for name, _ in files}:
+            # nothing to write: keep the last output and fail the run
+            self.extractor.error = RuntimeError(f"all {len(files)} files failed")
+            print(f"❌ Streaming pipeline: all {len(files)} files failed and stay pending")
+        else:
+            FileUtils.write_json_records(manifest.iter_records(), self.extractor.output_path)
+            BillStore.default().write_output(self.extractor.output_path, manifest.iter_records())
+            manifest.save()
+            if failed:
+                print(f"⚠️ Streaming pipeline: {len(failed)} of {len(files)} files failed and stay pending")
+
+        self.report(time.perf_counter() - started, len(files))
+        return written
+
+    def report(self, seconds, files):
+        summary = {
+            "files": files,
+            "failed_files": sorted(self.failed_files),
+            "seconds": round(seconds, 3),
+            "files_per_second": round(files / seconds, 3) if seconds else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {name: stats.to_dict() for name, stats in self.stats.items()},
+            "template_fast_path": self.extractor.templates.stats()
+        }
+        if self.extractor.router.enabled:
+            summary["model_routing"] = self.extractor.router.report()
+        print(f"🚰 Streaming pipeline: {json.dumps(summary, indent=2)}")
+        return summary
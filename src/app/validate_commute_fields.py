@@ -1,6 +1,8 @@
 from datetime import datetime
 import uuid
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
+from commons.client_address_registry import ClientAddressRegistry
 
 MONTH_MAP = {
     "jan": 1, "feb": 2, "mar": 3, "apr": 4,
@@ -44,17 +46,23 @@ class ValidateCommuteFeilds:
         drop = (ride.get("drop_address") or "").lower()
 
         client = ride.get("client", "").upper()
-        addresses = client_addresses.get(client, [])
 
-        best_address_score = 0
+        if isinstance(client_addresses, ClientAddressRegistry):
+            # indexed lookup; unlike the loop below it skips addresses sharing
+            # (almost) no trigrams with the pickup/drop
+            best_address_score = client_addresses.best_score(client, pickup, drop)
+        else:
+            addresses = client_addresses.get(client, [])
 
-        for addr in addresses:
-            addr = addr.lower()
-            best_address_score = max(
-                best_address_score,
-                fuzz.partial_ratio(pickup, addr),
-                fuzz.partial_ratio(drop, addr)
-            )
+            best_address_score = 0
+
+            for addr in addresses:
+                addr = addr.lower()
+                best_address_score = max(
+                    best_address_score,
+                    fuzz.partial_ratio(pickup, addr),
+                    fuzz.partial_ratio(drop, addr)
+                )
 
         validations["address_match_score"] = best_address_score
         validations["address_match"] = best_address_score >= 40
@@ -102,4 +110,160 @@ class ValidateCommuteFeilds:
             validations["name_match"]
         ])
 
-        return validations
\ No newline at end of file
+        return validations
+
+    # -------------------------
+    # Batch validation
+    # -------------------------
+    # Same results as validate_ride / validate_meal for a whole list of
+    # records. Every distinct date is parsed once, and name/address scores
+    # come from rapidfuzz cdist matrices over the distinct strings (names
+    # and addresses repeat a lot within a month), spread over `workers`
+    # threads.
+
+    @staticmethod
+    def _assign_ids(records):
+        for record in records:
+            if record["id"] is None:
+                record["id"] = MANUAL + "-" + record["filename"] + "-" + str(uuid.uuid4())
+
+    @staticmethod
+    def _month_matches(records):
+        months = {}
+        for date in {record["date"] for record in records if isinstance(record.get("date"), str)}:
+            try:
+                months[date] = datetime.strptime(date, "%d/%m/%Y").month
+            except ValueError:
+                months[date] = None
+
+        matches = []
+        for record in records:
+            try:
+                ride_month = months.get(record["date"]) if isinstance(record["date"], str) else None
+                if ride_month is None:
+                    # missing or unparseable date, strptime would have raised
+                    matches.append(False)
+                    continue
+                expected_month = MONTH_MAP.get(record["emp_month"].lower())
+                matches.append(ride_month == expected_month)
+            except Exception:
+                matches.append(False)
+        return matches
+
+    @staticmethod
+    def _pair_scores(left, right, workers):
+        """
+        fuzz.partial_ratio(left[i], right[i]) for every i.
+        """
+        left_values = sorted(set(left))
+        right_values = sorted(set(right))
+        if not left_values or not right_values:
+            return []
+        matrix = process.cdist(left_values, right_values, scorer=fuzz.partial_ratio,
+                               dtype=np.float64, workers=workers)
+        left_index = {value: i for i, value in enumerate(left_values)}
+        right_index = {value: i for i, value in enumerate(right_values)}
+        return [float(matrix[left_index[a], right_index[b]]) for a, b in zip(left, right)]
+
+    @staticmethod
+    def _address_scores(rides, client_addresses, workers):
+        scores = [0] * len(rides)
+        by_client = {}
+        for i, ride in enumerate(rides):
+            by_client.setdefault(ride.get("client", "").upper(), []).append(i)
+
+        for client, indexes in by_client.items():
+            if isinstance(client_addresses, ClientAddressRegistry):
+                addresses = client_addresses.addresses(client)
+            else:
+                addresses = [addr.lower() for addr in client_addresses.get(client, [])]
+            if not addresses:
+                continue
+            pickups = [(rides[i].get("pickup_address") or "").lower() for i in indexes]
+            drops = [(rides[i].get("drop_address") or "").lower() for i in indexes]
+            values = sorted(set(pickups) | set(drops))
+            best = process.cdist(values, addresses, scorer=fuzz.partial_ratio,
+                                 dtype=np.float64, workers=workers).max(axis=1)
+            best_by_value = dict(zip(values, best.tolist()))
+            for i, pickup, drop in zip(indexes, pickups, drops):
+                score = max(best_by_value[pickup], best_by_value[drop])
+                # the per-record loop starts from an int 0 and keeps it on ties
+                scores[i] = score if score > 0 else 0
+        return scores
+
+    @staticmethod
+    def validate_rides(rides: list, client_addresses: dict, workers: int = -1) -> list:
+        ValidateCommuteFeilds._assign_ids(rides)
+        month_matches = ValidateCommuteFeilds._month_matches(rides)
+        name_scores = ValidateCommuteFeilds._pair_scores(
+            [(ride.get("rider_name") or "").lower() for ride in rides],
+            [(ride.get("emp_name") or "").lower() for ride in rides],
+            workers
+        )
+        address_scores = ValidateCommuteFeilds._address_scores(rides, client_addresses, workers)
+
+        results = []
+        for month_match, name_score, address_score in zip(month_matches, name_scores, address_scores):
+            validations = {
+                "month_match": month_match,
+                "name_match_score": name_score,
+                "name_match": name_score >= 75,
+                "address_match_score": address_score,
+                "address_match": address_score >= 40
+            }
+            validations["is_valid"] = all([
+                validations["month_match"],
+                validations["name_match"],
+                validations["address_match"]
+            ])
+            results.append(validations)
+        return results
+
+    @staticmethod
+    def extraction_errors(records: list, validations: list, name_floor: float = 40,
+                          address_floor: float = 20) -> list:
+        """
+        Per record, the failed checks that point at a misread field rather
+        than a claim that is really out of policy: a date that is not
+        dd/mm/yyyy, a name or pickup/drop address that matches almost
+        nothing. Used to send an extraction to a larger model.
+        """
+        results = []
+        for record, validation in zip(records, validations):
+            errors = []
+            date = record.get("date")
+            if isinstance(date, str) and not validation.get("month_match"):
+                try:
+                    datetime.strptime(date, "%d/%m/%Y")
+                except ValueError:
+                    errors.append("date_format")
+            if validation.get("name_match_score", 100) < name_floor:
+                errors.append("name")
+            if validation.get("address_match_score", 100) < address_floor:
+                errors.append("address")
+            results.append(errors)
+        return results
+
+    @staticmethod
+    def validate_meals(meal_invoices: list, workers: int = -1) -> list:
+        ValidateCommuteFeilds._assign_ids(meal_invoices)
+        month_matches = ValidateCommuteFeilds._month_matches(meal_invoices)
+        name_scores = ValidateCommuteFeilds._pair_scores(
+            [(meal.get("buyer_name") or "").lower() for meal in meal_invoices],
+            [(meal.get("emp_name") or "").lower() for meal in meal_invoices],
+            workers
+        )
+
+        results = []
+        for month_match, name_score in zip(month_matches, name_scores):
+            validations = {
+                "month_match": month_match,
+                "name_match_score": name_score,
+                "name_match": name_score >= 75
+            }
+            validations["is_valid"] = all([
+                validations["month_match"],
+                validations["name_match"]
+            ])
+            results.append(validations)
+        return results
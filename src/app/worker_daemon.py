@@ -0,0 +1,160 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import signal
+import threading
+import time
+import traceback
+
+from langchain_groq import ChatGroq
+
+from app import decision_service
+from app.batch_runner import CATEGORIES, BatchRunner
+from commons.bill_store import BillStore
+from commons.client_address_registry import ClientAddressRegistry
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.duplicate_index import DuplicateIndex
+from commons.job_queue import JobQueue
+from commons.llm_cache import LLMCache
+from commons.metrics import Metrics
+from commons.ocr_cache import OcrCache
+from commons.ocr_pool import OcrPool
+from commons.receipt_segmenter import ReceiptSegmenter
+
+## Run command : python src/app/worker_daemon.py [workers]
+## Jobs are submitted with src/app/job_client.py; run one daemon per queue, from the repository root.
+
+
+class WorkerDaemon:
+    """
+    Long-running process that takes jobs off the JobQueue with a few
+    worker threads, so the imports (langchain, cv2, fitz, ...), the
+    ChatGroq client, the OCR process pool, the client address registry and
+    the OCR/LLM caches are set up once instead of per script run.
+
+    Job kinds:
+      - folder: {"category": "meal"|"commute", "folder": path, "full": bool}
+      - batch:  {"resources_dir": path, "full": bool}, queued again as
+                one folder job per employee folder
+      - decide: {"emp_id", "category", "month"}, all optional
+    A failing job is marked failed with its error and the daemon carries
+    on. SIGINT/SIGTERM stop it after the running jobs.
+    """
+
+    def __init__(self, workers=None, poll_seconds=None, queue=None, llm=None):
+        daemon_config = config.get(Co.DAEMON, {})
+        self.workers = workers or daemon_config.get(Co.WORKERS, 2)
+        self.poll_seconds = poll_seconds or daemon_config.get(Co.POLL_SECONDS, 0.5)
+        self.queue = queue or JobQueue()
+        self.llm = llm or ChatGroq(
+            model=config[Co.LLM][Co.MODEL],
+            temperature=config[Co.LLM][Co.TEMPERATURE]
+        )
+        self.client_addresses = ClientAddressRegistry.default()
+        # the shared caches and indexes are opened once, before the workers start
+        for warm in (OcrCache, LLMCache, DuplicateIndex, BillStore, ReceiptSegmenter):
+            warm.default()
+        ocr_workers = config.get(Co.OCR, {}).get(Co.WORKERS, 1)
+        self.ocr_pool = OcrPool() if ocr_workers != 1 else None
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        print("🛑 Stopping after the running jobs")
+        self._stop.set()
+
+    # ------------------------
+    # Jobs
+    # ------------------------
+    def run_folder(self, payload):
+        category, folder = payload["category"], payload["folder"]
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category {category}, expected one of {sorted(CATEGORIES)}")
+        runner = BatchRunner(incremental=False if payload.get("full") else None, llm=self.llm)
+        receipts, pending = runner.run_folder(category, folder, self.llm, self.ocr_pool, self.client_addresses)
+        return {"receipts": receipts, "pending": pending}
+
+    def run_batch(self, payload):
+        runner = BatchRunner(payload.get("resources_dir", "resources"))
+        job_ids = [self.queue.submit("folder", {"category": category, "folder": folder,
+                                                "full": bool(payload.get("full"))}, target=os.path.normpath(folder))
+                   for category, folder in runner.find_folders()]
+        return {"folder_jobs": job_ids}
+
+    def run_decide(self, payload):
+        decisions = decision_service.main(llm=self.llm, emp_id=payload.get("emp_id"),
+                                          category=payload.get("category"), month=payload.get("month"))
+        return {"decisions": len(decisions) if decisions is not None else None}
+
+    def run_job(self, job):
+        handlers = {"folder": self.run_folder, "batch": self.run_batch, "decide": self.run_decide}
+        if job["kind"] not in handlers:
+            raise ValueError(f"Unknown job kind {job['kind']}")
+        return handlers[job["kind"]](job["payload"])
+
+    # ------------------------
+    # Workers
+    # ------------------------
+    def _work_once(self, name):
+        """
+        Claims and runs one job. Returns False when the queue was empty.
+        """
+        job = self.queue.claim(name)
+        if job is None:
+            return False
+
+        print(f"▶️ [{name}] job {job['id']} {job['kind']} {job['payload']}")
+        started = time.perf_counter()
+        try:
+            result = self.run_job(job)
+            self.queue.finish(job["id"], result)
+            print(f"✅ [{name}] job {job['id']} done in {time.perf_counter() - started:.1f}s: {result}")
+        except Exception as e:
+            traceback.print_exc()
+            self.queue.finish(job["id"], error=f"{type(e).__name__}: {e}")
+            print(f"❌ [{name}] job {job['id']} failed: {e}")
+        Metrics.default().export()
+        return True
+
+    def _work(self, name):
+        while not self._stop.is_set():
+            try:
+                if not self._work_once(name):
+                    self._stop.wait(self.poll_seconds)
+            except Exception as e:
+                # a failed claim/finish/export must not end the worker (the
+                # daemon exits once every worker thread is gone)
+                traceback.print_exc()
+                print(f"❌ [{name}] worker error: {e}")
+                self._stop.wait(self.poll_seconds)
+
+    def run(self):
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"♻️ {requeued} jobs of an earlier daemon queued again")
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        print(f"🚀 Worker daemon: {self.workers} workers on {self.queue.path} ({self.queue.counts()})")
+        threads = [threading.Thread(target=self._work, args=(f"worker-{i}",), daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        finally:
+            if self.ocr_pool is not None:
+                self.ocr_pool.close()
+            print(f"👋 Worker daemon stopped ({self.queue.counts()})")
+
+
+# ------------------------
+# Script Entry Point
+# ------------------------
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    WorkerDaemon(workers).run()
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import fitz
+from rapidfuzz import fuzz
+
+from commons.FileUtils import FileUtils, RECEIPT_EXTENSIONS
+from commons.page_renderer import PageRenderer
+from commons.tesseract_backend import TesseractBackend
+
+## Run command : python src/benchmark/ocr_backend_benchmark.py resources pytesseract tesserocr batch_cli
+## Every page is OCR'd, including pages that have native text, so all sample receipts count.
+
+
+def render_pages(resources_root):
+    settings = FileUtils.ocr_settings()
+    pages = []
+    for dir_path, _, filenames in sorted(os.walk(resources_root)):
+        if "policy" in dir_path:
+            continue
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(RECEIPT_EXTENSIONS):
+                continue
+            with fitz.open(os.path.join(dir_path, filename)) as doc:
+                for page in doc:
+                    # copied, since the rendered array is only a view of its pixmap
+                    _, gray = PageRenderer.default().render_for_ocr(
+                        page,
+                        settings["dpi"],
+                        settings["threshold_block_size"],
+                        settings["threshold_c"]
+                    )
+                    pages.append((f"{filename}#p{page.number + 1}", gray.copy()))
+    return pages
+
+
+def run_backend(name, images):
+    backend = TesseractBackend.create(name)
+    started = time.perf_counter()
+    texts = []
+    for i in range(0, len(images), backend.batch_size):
+        texts.extend(backend.images_to_strings(images[i:i + backend.batch_size]))
+    return texts, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    resources_root = sys.argv[1] if len(sys.argv) > 1 else "resources"
+    backend_names = sys.argv[2:] or ["pytesseract", "tesserocr", "batch_cli"]
+
+    pages = render_pages(resources_root)
+    images = [gray for _, gray in pages]
+    print(f"🖼 Rendered {len(images)} pages from {resources_root}")
+
+    baseline = None
+    baseline_name = None
+    for name in backend_names:
+        try:
+            texts, seconds = run_backend(name, images)
+        except Exception as e:
+            print(f"⚠️ {name}: skipped ({e})")
+            continue
+
+        if baseline is None:
+            baseline, baseline_name = texts, name
+        similarity = sum(fuzz.ratio(a, b) for a, b in zip(baseline, texts)) / max(1, len(texts))
+
+        print(
+            f"⏱ {name:12s} {seconds:8.2f}s  "
+            f"{len(images) / seconds if seconds else 0:6.2f} pages/s  "
+            f"text similarity to {baseline_name}: {similarity:.1f}"
+        )
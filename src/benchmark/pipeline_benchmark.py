@@ -0,0 +1,196 @@
+import functools
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from app import decision_service
+from app.batch_runner import BatchRunner
+from app.commute_invoice_extractor import CommuteExtractor
+from app.meal_invoice_extractor import MealExtractor
+from benchmark.stub_llm import StubChatModel
+from benchmark.synthetic_receipts import FORMATS, SyntheticReceipts
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.duplicate_index import DuplicateIndex
+from commons.FileUtils import FileUtils
+from commons.llm_cache import BYPASS_ENV
+from commons.metrics import METRICS_ENV, Metrics, peak_rss_mb
+from commons.model_router import ModelRouter
+
+## Run command : python src/benchmark/pipeline_benchmark.py [cab] [meal] [employees] [latency_ms] [formats] [out.json]
+## e.g. python src/benchmark/pipeline_benchmark.py 200 200 20 300 native,image,png .cache/benchmark.json
+## Everything runs offline in a scratch folder: synthetic receipts, a stub chat model, fresh caches.
+## Image-only PDFs and PNGs need tesseract; use formats=native without it.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class StageTimer:
+    """
+    Wraps functions so every call is timed under a stage name.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self._restore = []
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, owner, name, stage):
+        original = inspect.getattr_static(owner, name)
+        is_static = isinstance(original, staticmethod)
+        function = original.__func__ if is_static else original
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+
+        setattr(owner, name, staticmethod(timed) if is_static else timed)
+        self._restore.append((owner, name, original))
+
+    def restore(self):
+        for owner, name, original in reversed(self._restore):
+            setattr(owner, name, original)
+        self._restore = []
+
+    @staticmethod
+    def percentiles(samples):
+        values = np.array(samples, dtype=np.float64)
+        return {
+            "count": len(samples),
+            "total_seconds": round(float(values.sum()), 4),
+            "p50_ms": round(float(np.percentile(values, 50)) * 1000, 2),
+            "p90_ms": round(float(np.percentile(values, 90)) * 1000, 2),
+            "p99_ms": round(float(np.percentile(values, 99)) * 1000, 2),
+            "max_ms": round(float(values.max()) * 1000, 2)
+        }
+
+    def report(self):
+        return {stage: self.percentiles(samples) for stage, samples in sorted(self.samples.items()) if samples}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_workdir(workdir, cab, meal, employees, formats):
+    """
+    Synthetic resources, clients.json, the prompts and the policy output the
+    decision service needs, laid out like the repository.
+    """
+    receipts = SyntheticReceipts(os.path.join(workdir, "resources"), employees, formats)
+    generated = receipts.generate(cab, meal)
+    receipts.write_clients(os.path.join(workdir, "clients.json"))
+
+    shutil.copytree(os.path.join(REPO_ROOT, "src", "prompt"), os.path.join(workdir, "src", "prompt"))
+    policy_dir = os.path.join("src", "model_output", "policy", config[Co.LLM][Co.MODEL])
+    os.makedirs(os.path.join(workdir, policy_dir))
+    shutil.copy(os.path.join(REPO_ROOT, policy_dir, "policy.json"), os.path.join(workdir, policy_dir))
+    return generated
+
+
+def run(cab, meal, employees, latency_ms, formats, out_path):
+    workdir = tempfile.mkdtemp(prefix="billdesk_benchmark_")
+    out_path = os.path.abspath(out_path)
+    previous_dir = os.getcwd()
+
+    generate_started = time.perf_counter()
+    generated = prepare_workdir(workdir, cab, meal, employees, formats)
+    generate_seconds = time.perf_counter() - generate_started
+    print(f"🧪 {cab} cab + {meal} meal receipts for {employees} employees in {workdir}")
+
+    # every call must reach the stub, and the caches start empty
+    os.environ[BYPASS_ENV] = "1"
+    # the pipeline's own stage metrics (also in the OCR workers) go in the report
+    os.environ[METRICS_ENV] = "1"
+    llm = StubChatModel(model_name=config[Co.LLM][Co.MODEL], latency_ms=latency_ms, jitter_ms=latency_ms / 4)
+    timer = StageTimer()
+    timer.wrap(FileUtils, "process_folder", "ocr_folder")
+    timer.wrap(FileUtils, "get_ocr_text_from_file", "ocr_file")
+    timer.wrap(CommuteExtractor, "validate", "validate")
+    timer.wrap(MealExtractor, "validate", "validate")
+    timer.wrap(DuplicateIndex, "flag", "duplicates")
+    timer.wrap(FileUtils, "write_json_to_file", "write_output")
+
+    os.chdir(workdir)
+    started = time.perf_counter()
+    try:
+        runner = BatchRunner("resources", incremental=False, llm=llm)
+        extraction = runner.run()
+        extract_seconds = time.perf_counter() - started
+
+        decision_started = time.perf_counter()
+        decisions = decision_service.main(llm=llm)
+        timer.add("decision", time.perf_counter() - decision_started)
+    finally:
+        os.chdir(previous_dir)
+        timer.restore()
+        shutil.rmtree(workdir, ignore_errors=True)
+    seconds = time.perf_counter() - started
+
+    for result in runner.results:
+        timer.add("extract_folder", result["seconds"])
+    for call_seconds in llm.call_seconds:
+        timer.add("llm_call", call_seconds)
+
+    receipts = cab + meal
+    summary = {
+        "revision": git_revision(),
+        "parameters": {"cab": cab, "meal": meal, "employees": employees, "latency_ms": latency_ms,
+                       "formats": list(formats), "ocr_mode": config.get(Co.OCR, {}).get(Co.MODE, "fixed"),
+                       "ocr_workers": config.get(Co.OCR, {}).get(Co.WORKERS, 1)},
+        "generated": generated,
+        "generate_seconds": round(generate_seconds, 3),
+        "receipts": receipts,
+        "extracted_units": extraction["receipts"],
+        "failed_folders": extraction["failed"],
+        "llm_calls": llm.calls,
+        "decisions": len(decisions or []),
+        "seconds": round(seconds, 3),
+        "extract_seconds": round(extract_seconds, 3),
+        "receipts_per_second": round(receipts / extract_seconds, 3) if extract_seconds else 0.0,
+        # null where the platform does not report it
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(children=True),
+        "stages": timer.report(),
+        "model_routing": ModelRouter.totals(),
+        "pipeline_metrics": Metrics.default().summary()
+    }
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\n📈 Benchmark: {json.dumps(summary, indent=2)}")
+    print(f"📄 written to {out_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    cab = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    meal = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    employees = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    latency_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 200
+    formats = sys.argv[5].split(",") if len(sys.argv) > 5 else list(FORMATS)
+    out_path = sys.argv[6] if len(sys.argv) > 6 else "pipeline_benchmark.json"
+
+    summary = run(cab, meal, employees, latency_ms, formats, out_path)
+    sys.exit(1 if summary["failed_folders"] else 0)
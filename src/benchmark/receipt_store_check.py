@@ -0,0 +1,87 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+
+import psycopg2
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from persist.receipt_store import KEY_COLUMN, TABLES, ReceiptStore
+
+## Run command : python src/benchmark/receipt_store_check.py [model]
+## Loads the stored extractor output twice into a scratch schema of the configured database, on top of rows in the
+## old id-only layout, and checks that the second load changes no row count. The scratch schema is dropped afterwards.
+
+SCHEMA = "receipt_store_check"
+FOLDERS = {"cab": "commute", "meal": "meal"}
+
+
+def load_records(category, model):
+    records = []
+    for path in ReceiptStore.output_files(os.path.join("src/model_output", FOLDERS[category], model)):
+        with open(path, "r", encoding="utf-8") as f:
+            records.extend(json.load(f))
+    return records
+
+
+def create_legacy_table(cur, category, record_id):
+    """
+    A table as the old loader left it: no employee columns, one row of a
+    receipt that is also in the output and one row without an id.
+    """
+    spec = TABLES[category]
+    id_column = spec["columns"][0][0]
+    cur.execute(f"CREATE TABLE {spec['table']} ({id_column} TEXT, amount NUMERIC, ocr TEXT)")
+    cur.execute(f"INSERT INTO {spec['table']} ({id_column}, amount) VALUES (%s, 1), (NULL, 2)", (record_id,))
+
+
+def count_rows(cur, table):
+    cur.execute(f"SELECT COUNT(*), COUNT(*) FILTER (WHERE {KEY_COLUMN} IS NULL) FROM {table}")
+    return cur.fetchone()
+
+
+if __name__ == "__main__":
+    model = sys.argv[1] if len(sys.argv) > 1 else config[Co.LLM][Co.MODEL]
+
+    store = ReceiptStore()
+    admin = psycopg2.connect(**store.connect_args)
+    admin.autocommit = True
+    store.connect_args["options"] = f"-c search_path={SCHEMA}"
+    failures = 0
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path = {SCHEMA}")
+
+            for category in TABLES:
+                records = load_records(category, model)
+                keyed = [record for record in records if ReceiptStore.record_key(record) is not None]
+                if not keyed:
+                    print(f"⚠️ {category}: no stored output for {model}, skipped")
+                    continue
+                table = TABLES[category]["table"]
+                create_legacy_table(cur, category, str(keyed[0]["id"]))
+
+                counts = []
+                for _ in range(2):
+                    store.upsert(category, records)
+                    counts.append(count_rows(cur, table))
+                rows = len(ReceiptStore.to_rows(category, records))
+                # the old row of the first receipt is taken over, the one without an id stays
+                expected = (rows + 1, 0)
+                ok = counts[0] == counts[1] == expected
+                failures += not ok
+                print(f"{'✅' if ok else '❌'} {table}: {len(records)} records, rows after each load "
+                      f"{[total for total, _ in counts]} (expected {expected[0]}, "
+                      f"{max(unkeyed for _, unkeyed in counts)} without a key)")
+    finally:
+        store.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        admin.close()
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,113 @@
+import ast
+import json
+import random
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from benchmark.synthetic_receipts import CAB_LABELS, MEAL_LABELS, parse_fields
+
+RECEIPTS_START = "Here are the receipts:\n"
+RECEIPTS_END = "\n\nOutput must follow"
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatGroq, for benchmarks. Answers the extractor
+    prompts by reading the synthetic receipts' "Label: value" lines and the
+    decision prompt by approving every group, after sleeping latency_ms
+    (± jitter_ms). Token counts are estimated from the text length and
+    reported like Groq does (usage_metadata and response_metadata).
+    """
+
+    model_name: str = "stub"
+    temperature: float = 0
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    seed: int = 5
+    calls: int = 0
+    call_seconds: List[float] = []
+    _random: random.Random = PrivateAttr()
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    # ------------------------
+    # Answers
+    # ------------------------
+    @staticmethod
+    def _extraction(user_text):
+        start = user_text.index(RECEIPTS_START) + len(RECEIPTS_START)
+        receipts = ast.literal_eval(user_text[start:user_text.index(RECEIPTS_END, start)])
+        labels = CAB_LABELS if "pickup_address" in user_text else MEAL_LABELS
+        records = []
+        for receipt in receipts:
+            for filename, text in receipt.items():
+                record = {"filename": filename, **parse_fields(text, labels), "ocr": text}
+                if labels is CAB_LABELS:
+                    record["service_provider"] = "Cab"
+                elif record["amount"] is None:
+                    record["amount"] = 0.0
+                records.append(record)
+        return records
+
+    @staticmethod
+    def _decisions(user_text):
+        groups = json.loads(user_text)["groups"]
+        return [{
+            "decision": "APPROVE",
+            "employee_id": group.get("employee_id"),
+            "employee_name": group.get("employee_name"),
+            "category": group.get("category"),
+            "valid_bill_ids": group.get("valid_bills", []),
+            "invalid_bill_ids": group.get("invalid_bills", []),
+            "reasons": ["Approved by the benchmark stub."]
+        } for group in groups]
+
+    def answer(self, messages):
+        user_text = "\n".join(str(m.content) for m in messages if m.type != "system")
+        if RECEIPTS_START in user_text:
+            return json.dumps(self._extraction(user_text), ensure_ascii=False)
+        try:
+            return json.dumps(self._decisions(user_text), ensure_ascii=False)
+        except (ValueError, KeyError, TypeError):
+            return "[]"
+
+    # ------------------------
+    # BaseChatModel
+    # ------------------------
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        started = time.perf_counter()
+        content = self.answer(messages)
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        output_tokens = len(content) // 4 + 1
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                 "total_tokens": input_tokens + output_tokens}
+        message = AIMessage(
+            content=content,
+            usage_metadata=usage,
+            response_metadata={
+                "model_name": self.model_name,
+                "token_usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens,
+                                "total_tokens": input_tokens + output_tokens}
+            }
+        )
+        with self._lock:
+            self.calls += 1
+            self.call_seconds.append(time.perf_counter() - started)
+        return ChatResult(generations=[ChatGeneration(message=message)])
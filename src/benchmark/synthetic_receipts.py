@@ -0,0 +1,177 @@
+import calendar
+import json
+import os
+import random
+import re
+
+import fitz
+
+from app.validate_commute_fields import MONTH_MAP
+
+FORMATS = ("native", "image", "png")
+
+FIRST_NAMES = ["naveen", "smitha", "sireesha", "ashwini", "rahul", "priya", "arjun", "kavya", "vikram", "meera"]
+DRIVERS = ["Ravi Kumar", "Suresh B", "Manjunath", "Imran Khan", "Prakash R"]
+HOME_ADDRESSES = [
+    "12th Cross, Indiranagar, Bengaluru, Karnataka",
+    "HSR Layout Sector 2, Bengaluru, Karnataka",
+    "Marathahalli Bridge, Outer Ring Road, Bengaluru",
+    "Koramangala 5th Block, Bengaluru, Karnataka",
+    "Electronic City Phase 1, Bengaluru, Karnataka"
+]
+CLIENT_ADDRESSES = {
+    "TESCO": ["Gate, Tesco, Vydehi Signal, Whitefield, Bengaluru, Karnataka",
+              "Tesco Office, Whitefield Main Road, Bengaluru"],
+    "AMEX": ["AMEX Office, Bagmane Tech Park, Mahadevapura, Bengaluru",
+             "Bagmane World Technology Center, Mahadevapura, Bangalore"]
+}
+MEAL_ITEMS = ["1 Mini Meal Veg", "1 Thali", "2 Idli Vada", "1 Paneer Roll", "1 Curd Rice"]
+
+# "Label: value" lines of the synthetic layouts → extracted field
+CAB_LABELS = {"Ride ID": "id", "Rider": "rider_name", "Driver": "driver_name", "Date": "date", "Time": "time",
+              "Pickup": "pickup_address", "Drop": "drop_address", "Distance": "distance_km", "Total": "amount"}
+MEAL_LABELS = {"Bill No": "id", "Customer": "buyer_name", "Date": "date", "Total": "amount"}
+
+
+def parse_fields(text, labels):
+    """
+    Reads the "Label: value" lines of a synthetic receipt (native or OCR'd
+    text) into extracted fields; what the stub LLM returns.
+    """
+    fields = {field: None for field in labels.values()}
+    for line in text.splitlines():
+        label, _, value = line.partition(":")
+        field = labels.get(label.strip())
+        if field is None or not value.strip():
+            continue
+        value = value.strip()
+        if field in ("amount", "distance_km"):
+            number = re.search(r"\d+(?:\.\d+)?", value.replace(",", ""))
+            value = float(number.group()) if number else None
+        fields[field] = value
+    date = re.match(r"(\d{2})/(\d{2})/(\d{4})$", fields.get("date") or "")
+    fields["day"], fields["month"], fields["year"] = date.groups() if date else (None, None, None)
+    return fields
+
+
+class SyntheticReceipts:
+    """
+    Writes a resources tree of made-up employees with cab and meal
+    receipts: resources/<commute|meal>/<emp_id>_<name>_<month>_<client>/.
+    Receipts rotate through the requested formats: PDFs with native text,
+    image-only PDFs (the same page rasterized, so it needs OCR) and PNGs.
+    A few rides are out of month or by someone else, and every 25th bill
+    repeats an earlier one, so validation and duplicate checks have work.
+    """
+
+    def __init__(self, root, employees=10, formats=FORMATS, seed=11):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown receipt formats {sorted(unknown)}, expected {FORMATS}")
+        self.root = root
+        self.formats = list(formats)
+        self.random = random.Random(seed)
+        months = list(MONTH_MAP)
+        self.employees = [
+            (f"IIIPL-{9000 + i}", f"{FIRST_NAMES[i % len(FIRST_NAMES)]}{i}", self.random.choice(months),
+             self.random.choice(list(CLIENT_ADDRESSES)).lower())
+            for i in range(employees)
+        ]
+        self.files = 0
+
+    def write_clients(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(CLIENT_ADDRESSES, f, indent=2)
+
+    # ------------------------
+    # Receipt text
+    # ------------------------
+    def _date(self, month):
+        month_number = MONTH_MAP[month]
+        if self.random.random() < 0.1:
+            month_number = month_number % 12 + 1
+        day = self.random.randint(1, calendar.monthrange(2025, month_number)[1])
+        return f"{day:02d}/{month_number:02d}/2025"
+
+    def cab_lines(self, number, name, month, client):
+        rider = name if self.random.random() > 0.1 else self.random.choice(FIRST_NAMES)
+        office = self.random.choice(CLIENT_ADDRESSES[client.upper()])
+        home = self.random.choice(HOME_ADDRESSES)
+        pickup, drop = (home, office) if number % 2 else (office, home)
+        return [
+            "Cab Receipt",
+            f"Ride ID: CRN{7000000 + number}",
+            f"Rider: {rider}",
+            f"Driver: {self.random.choice(DRIVERS)}",
+            f"Date: {self._date(month)}",
+            f"Time: {self.random.randint(7, 21):02d}:{self.random.randint(0, 59):02d}",
+            f"Pickup: {pickup}",
+            f"Drop: {drop}",
+            f"Distance: {self.random.uniform(3, 25):.1f} km",
+            f"Total: Rs {self.random.uniform(90, 650):.2f}"
+        ]
+
+    def meal_lines(self, number, name, month):
+        return [
+            "Meal Receipt",
+            f"Bill No: MB{5000000 + number}",
+            f"Customer: {name}",
+            f"Date: {self._date(month)}",
+            f"Item: {self.random.choice(MEAL_ITEMS)}",
+            f"Total: Rs {self.random.choice([90, 110, 125, 158, 180]):.2f}"
+        ]
+
+    # ------------------------
+    # Files
+    # ------------------------
+    def _write(self, lines, path_stem, receipt_format):
+        doc = fitz.open()
+        page = doc.new_page(width=420, height=60 + 22 * len(lines))
+        for i, line in enumerate(lines):
+            page.insert_text((30, 40 + 22 * i), line, fontsize=12)
+
+        if receipt_format == "native":
+            path = path_stem + ".pdf"
+            doc.save(path)
+        else:
+            pix = page.get_pixmap(dpi=200)
+            if receipt_format == "png":
+                path = path_stem + ".png"
+                pix.save(path)
+            else:
+                path = path_stem + ".pdf"
+                image_doc = fitz.open()
+                image_page = image_doc.new_page(width=page.rect.width, height=page.rect.height)
+                image_page.insert_image(image_page.rect, pixmap=pix)
+                image_doc.save(path)
+                image_doc.close()
+        doc.close()
+        self.files += 1
+        return path
+
+    def generate(self, cab_receipts, meal_receipts):
+        """
+        Spreads the receipts over the employees and writes them. Returns
+        {"cab": n, "meal": n, "by_format": {...}}.
+        """
+        by_format = {receipt_format: 0 for receipt_format in self.formats}
+        earlier = {"cab": [], "meal": []}
+        for category, total in (("commute", cab_receipts), ("meal", meal_receipts)):
+            kind = "cab" if category == "commute" else "meal"
+            for number in range(total):
+                emp_id, name, month, client = self.employees[number % len(self.employees)]
+                folder = os.path.join(self.root, category, f"{emp_id}_{name}_{month}_{client}")
+                os.makedirs(folder, exist_ok=True)
+
+                if earlier[kind] and number % 25 == 24:
+                    lines = self.random.choice(earlier[kind])
+                elif kind == "cab":
+                    lines = self.cab_lines(number, name, month, client)
+                else:
+                    lines = self.meal_lines(number, name, month)
+                earlier[kind].append(lines)
+
+                receipt_format = self.formats[number % len(self.formats)]
+                self._write(lines, os.path.join(folder, f"{kind}_{number:05d}"), receipt_format)
+                by_format[receipt_format] += 1
+        return {"cab": cab_receipts, "meal": meal_receipts, "by_format": by_format}
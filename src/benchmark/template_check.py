@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from commons.FileUtils import FileUtils
+from commons.template_extractor import TemplateExtractor
+
+## Run command : python src/benchmark/template_check.py [model] [resources_dir]
+## Reads every sample receipt a template claims and compares the record with the stored LLM output for it.
+
+FOLDERS = {"cab": "commute", "meal": "meal"}
+
+
+def stored_records(category, model, folder):
+    path = os.path.join("src/model_output", FOLDERS[category], model, os.path.basename(folder))
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return {record.get("filename"): record for record in json.load(f)}
+
+
+def compare(record, stored):
+    """
+    [(field, template value, stored value)] for the fields that differ; the
+    OCR text is compared without trailing whitespace.
+    """
+    differences = []
+    for field, value in record.model_dump().items():
+        expected = stored.get(field)
+        if field == "ocr":
+            value, expected = (value or "").rstrip("\\n \n"), (expected or "").rstrip("\\n \n")
+        if value != expected:
+            differences.append((field, value, expected))
+    return differences
+
+
+if __name__ == "__main__":
+    model = sys.argv[1] if len(sys.argv) > 1 else "llama-3.3-70b-versatile"
+    resources_root = sys.argv[2] if len(sys.argv) > 2 else "resources"
+
+    checked = differing = 0
+    for category, folder_name in FOLDERS.items():
+        templates = TemplateExtractor(category)
+        category_root = os.path.join(resources_root, folder_name)
+        for folder in sorted(os.listdir(category_root)):
+            folder = os.path.join(category_root, folder)
+            stored = stored_records(category, model, folder) if os.path.isdir(folder) else None
+            if stored is None:
+                continue
+            for pdf_name, pdf_path in FileUtils.list_receipt_files(folder):
+                try:
+                    texts = FileUtils.get_ocr_text_from_file(pdf_name, pdf_path)
+                except Exception as e:
+                    print(f"⚠️ {pdf_path}: skipped ({e})")
+                    continue
+                for unit_id, text in texts.items():
+                    record = templates.match(unit_id, text)
+                    if record is None:
+                        continue
+                    checked += 1
+                    if unit_id not in stored:
+                        print(f"❓ {unit_id}: no stored record")
+                        differing += 1
+                        continue
+                    differences = compare(record, stored[unit_id])
+                    differing += bool(differences)
+                    for field, value, expected in differences:
+                        print(f"≠ {unit_id} {field}: template={value!r} stored={expected!r}")
+
+    print(f"🧾 {checked} receipts read by templates, {checked - differing} identical to the stored {model} output")
@@ -0,0 +1,77 @@
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.validate_commute_fields import ValidateCommuteFeilds, MONTH_MAP
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+## Run command : python src/benchmark/validation_benchmark.py [rides] [employees]
+## Synthetic rides are built from the sample commute outputs; both paths must give identical validations.
+
+
+def load_samples():
+    rides = []
+    for path in sorted(glob.glob("src/model_output/commute/*/IIIPL-*")):
+        with open(path, "r", encoding="utf-8") as f:
+            rides.extend(json.load(f))
+    return rides
+
+
+def synthetic_rides(samples, count, employees, seed=7):
+    random.seed(seed)
+    names = sorted({ride["emp_name"] for ride in samples if ride.get("emp_name")})
+    staff = [(f"IIIPL-{4000 + i}", f"{random.choice(names)} {i}", random.choice(list(MONTH_MAP)),
+              random.choice(["TESCO", "AMEX"])) for i in range(employees)]
+    addresses = [ride[key] for ride in samples for key in ("pickup_address", "drop_address") if ride.get(key)]
+
+    rides = []
+    for i in range(count):
+        sample = random.choice(samples)
+        emp_id, emp_name, emp_month, client = random.choice(staff)
+        rides.append({
+            **sample,
+            "id": None if i % 50 == 0 else f"RD{10 ** 16 + i}",
+            "filename": f"receipt_{i}",
+            "rider_name": emp_name.split(" ")[0] if i % 3 else sample.get("rider_name"),
+            "date": f"{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2025",
+            "pickup_address": random.choice(addresses),
+            "drop_address": random.choice(addresses),
+            "emp_id": emp_id,
+            "emp_name": emp_name,
+            "emp_month": emp_month,
+            "client": client
+        })
+    return rides
+
+
+def copies(rides):
+    # validation fills in missing ids, so each path gets its own records
+    return [dict(ride) for ride in rides]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    employees = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with open(config.get(Co.PATHS, {}).get(Co.CLIENTS_FILE, "clients.json"), "r", encoding="utf-8") as f:
+        client_addresses = json.load(f)
+    rides = synthetic_rides(load_samples(), count, employees)
+    print(f"🚕 {len(rides)} synthetic rides, {employees} employees")
+
+    started = time.perf_counter()
+    single = [ValidateCommuteFeilds.validate_ride(ride, client_addresses) for ride in copies(rides)]
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = ValidateCommuteFeilds.validate_rides(copies(rides), client_addresses)
+    batch_seconds = time.perf_counter() - started
+
+    print(f"⏱ per-record {single_seconds:8.3f}s  {len(rides) / single_seconds:10.0f} rides/s")
+    print(f"⏱ batch      {batch_seconds:8.3f}s  {len(rides) / batch_seconds:10.0f} rides/s")
+    print(f"🚀 speedup {single_seconds / batch_seconds:.1f}x, identical results: {single == batch}")
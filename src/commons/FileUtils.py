@@ -1,64 +1,215 @@
 import json
 import os
-from dataclasses import dataclass
 
-import cv2
 import fitz
-import numpy as np
-import pytesseract
 
+from commons.adaptive_ocr import AdaptiveOcr
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.metrics import Metrics
+from commons.page_renderer import PageRenderer
+from commons.receipt_segmenter import ReceiptSegmenter, UNIT_SEPARATOR
+from commons.tesseract_backend import TesseractBackend
 from entity.employee import Employee
 
 
+RECEIPT_EXTENSIONS = (".pdf", ".png", ".jpg")
+
+
 class FileUtils:
 
     @staticmethod
-    def get_ocr_text_from_file(pdf_name,pdf_path):
+    def ocr_settings():
+        """
+        Render and threshold settings for the OCR fallback. Anything that
+        changes the OCR output belongs here, since it is part of the OCR
+        cache key.
+        """
+        ocr_config = config.get(Co.OCR, {})
+        settings = {
+            "mode": ocr_config.get(Co.MODE, "fixed"),
+            "dpi": ocr_config.get(Co.DPI, 300),
+            "threshold_block_size": ocr_config.get(Co.THRESHOLD_BLOCK_SIZE, 31),
+            "threshold_c": ocr_config.get(Co.THRESHOLD_C, 2),
+            "render": "gray",
+            "backend": ocr_config.get(Co.BACKEND, "pytesseract"),
+            "lang": "eng"
+        }
+        if settings["mode"] == Co.ADAPTIVE:
+            adaptive_ocr = AdaptiveOcr.default()
+            settings["passes"] = adaptive_ocr.passes
+            settings["min_confidence"] = adaptive_ocr.min_confidence
+        return settings
 
-        doc = fitz.open(pdf_path)
-        full_text = ""
+    @staticmethod
+    def get_page_text(page, settings=None, clip=None):
+        return FileUtils.get_pages_text([page], settings, [clip])[0]
 
-        for page_num, page in enumerate(doc):
+    @staticmethod
+    def get_pages_text(pages, settings=None, clips=None):
+        """
+        Returns the text of each page, or of clips[i] (a page rectangle, None
+        for the whole page) when clips is given. Scanned pages are handed to
+        the OCR backend in groups of backend.batch_size, so a batching backend
+        sees several pages per tesseract call.
+        """
+        settings = settings or FileUtils.ocr_settings()
+        clips = clips or [None] * len(pages)
+        backend = TesseractBackend.default()
+        metrics = Metrics.default()
+        texts = [None] * len(pages)
+        rendered = []
+
+        def flush():
+            images = [gray for _, _, gray in rendered]
+            with metrics.span("tesseract"):
+                strings = backend.images_to_strings(images, settings["lang"])
+            for (index, _, _), text in zip(rendered, strings):
+                texts[index] = text
+            rendered.clear()
+
+        for index, (page, clip) in enumerate(zip(pages, clips)):
+            clip = fitz.Rect(clip) if clip is not None else None
             # Step 1 → Try native text extraction
-            native_text = page.get_text("text")
+            native_text = page.get_text("text", clip=clip)
             if native_text.strip():
-                full_text += native_text + "\n"
+                texts[index] = native_text
+                metrics.count("pages", source="native")
                 continue
+            metrics.count("pages", source="ocr")
 
             # Step 2 → OCR fallback (image based)
-            pix = page.get_pixmap(dpi=300)
-            img = np.frombuffer(pix.tobytes(), dtype=np.uint8)
-            img = cv2.imdecode(img, cv2.IMREAD_COLOR)
-
-            # Preprocess for accurate OCR
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            gray = cv2.adaptiveThreshold(
-                gray, 255,
-                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY,
-                31, 2
+            if settings["mode"] == Co.ADAPTIVE:
+                texts[index] = AdaptiveOcr.default().ocr_page(page, clip)
+                continue
+
+            # Grayscale render, binarized in place (see PageRenderer). The
+            # pixmap is kept with the array because the array is a view of it.
+            pix, gray = PageRenderer.default().render_for_ocr(
+                page,
+                settings["dpi"],
+                settings["threshold_block_size"],
+                settings["threshold_c"],
+                clip
             )
+            rendered.append((index, pix, gray))
+            if len(rendered) >= backend.batch_size:
+                flush()
+
+        if rendered:
+            flush()
+        return texts
+
+    @staticmethod
+    def get_file_text(pdf_path, settings=None):
+        settings = settings or FileUtils.ocr_settings()
+
+        with fitz.open(pdf_path) as doc:
+            texts = FileUtils.get_pages_text(list(doc), settings)
+
+        return "".join(text + "\n" for text in texts)
+
+    @staticmethod
+    def unit_cache_key(cache, pdf_path, unit):
+        """
+        OCR cache key of a receipt unit (see ReceiptSegmenter). A whole-file
+        unit keeps the plain file key, so unsegmented files hit the entries
+        cached before segmentation existed.
+        """
+        unit_id, page_num, clip = unit
+        if page_num is None:
+            return cache.key_for(pdf_path)
+        return cache.key_for(pdf_path, {
+            **FileUtils.ocr_settings(),
+            "unit": unit_id.split(UNIT_SEPARATOR, 1)[1],
+            "clip": list(clip) if clip is not None else None,
+            "segmentation": ReceiptSegmenter.default().settings()
+        })
 
-            text_ocr = pytesseract.image_to_string(gray, lang="eng")
-            full_text += text_ocr + "\n"
+    @staticmethod
+    def get_ocr_text_from_file(pdf_name,pdf_path,segment=True):
+        """
+        Returns {unit_id: text} for every receipt unit of the file: just
+        {pdf_name: text} unless the file holds several scanned receipts.
+        Each unit is cached on its own. segment=False always reads the file
+        whole (documents that are not receipts, e.g. the policy).
+        """
+        from commons.ocr_cache import OcrCache
 
-        return {pdf_name:full_text}
+        cache = OcrCache.default()
+        settings = FileUtils.ocr_settings()
+        with fitz.open(pdf_path) as doc:
+            texts = {}
+            units = ReceiptSegmenter.default().segment(doc, pdf_name) if segment else [(pdf_name, None, None)]
+            for unit in units:
+                unit_id, page_num, clip = unit
+                key = FileUtils.unit_cache_key(cache, pdf_path, unit)
+                text = cache.get(key)
+                if text is None:
+                    if page_num is None:
+                        pages_text = FileUtils.get_pages_text(list(doc), settings)
+                    else:
+                        pages_text = FileUtils.get_pages_text([doc[page_num]], settings, [clip])
+                    text = "".join(page_text + "\n" for page_text in pages_text)
+                    cache.put(key, text)
+                texts[unit_id] = text
+
+        return texts
 
     @staticmethod
-    def process_folder(folder_path: str):
+    def list_receipt_files(folder_path: str):
+        """
+        Returns (name, path) pairs for every receipt in the folder, sorted by
+        filename so the output order does not depend on the filesystem.
+        """
         if not os.path.isdir(folder_path):
             raise ValueError(f"Not a folder: {folder_path}")
 
-        results = []
-        for filename in os.listdir(folder_path):
-            if filename.lower().endswith((".pdf", ".png", ".jpg")):
-                pdf_path = os.path.join(folder_path, filename)
-                pdf_name = os.path.splitext(filename)[0]
+        files = []
+        with Metrics.default().span("scan_folder"):
+            for filename in sorted(os.listdir(folder_path)):
+                if filename.lower().endswith(RECEIPT_EXTENSIONS):
+                    pdf_path = os.path.join(folder_path, filename)
+                    pdf_name = os.path.splitext(filename)[0]
+                    files.append((pdf_name, pdf_path))
+        return files
+
+    @staticmethod
+    def process_folder(folder_path: str, ocr_pool=None, files=None):
+        """
+        OCRs every receipt in the folder and returns a list of {name: text},
+        one per receipt unit (see ReceiptSegmenter). Pass files, a subset of
+        list_receipt_files(folder_path), to OCR only those. Pages are spread
+        over an OcrPool when one is passed in or when config[ocr][workers]
+        is anything other than 1 (0 = all cores).
+        """
+        from commons.ocr_cache import OcrCache
+
+        if files is None:
+            files = FileUtils.list_receipt_files(folder_path)
+        if not files:
+            return []
+
+        if ocr_pool is None and config.get(Co.OCR, {}).get(Co.WORKERS, 1) != 1:
+            from commons.ocr_pool import OcrPool
+            with OcrPool() as pool:
+                return FileUtils.process_folder(folder_path, pool, files)
+
+        if ocr_pool is not None:
+            results = ocr_pool.process_files(files)
+            page_records = ocr_pool.pop_page_records()
+        else:
+            results = []
+            for pdf_name, pdf_path in files:
                 print(pdf_name)
                 print(f"📄 Processing: {pdf_path}")
                 result = FileUtils.get_ocr_text_from_file(pdf_name,pdf_path)
-                results.append(result)
+                results.extend({unit_id: text} for unit_id, text in result.items())
+            page_records = AdaptiveOcr.default().pop_records()
 
+        print(f"🗄 OCR cache: {OcrCache.default().stats()}")
+        if page_records:
+            print(f"🔎 Adaptive OCR: {AdaptiveOcr.default().summarize(page_records)}")
         return results
 
     @staticmethod
@@ -79,11 +230,33 @@ class FileUtils:
         data = json.loads(output)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-        with open(file_path, "w", encoding="utf-8") as f:
+        with Metrics.default().span("write_output"), open(file_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
 
         print(f"data written to {file_path}")
 
+    @staticmethod
+    def write_json_records(records, file_path):
+        """
+        Writes records (any iterable of dicts) as a JSON list, formatted like
+        write_json_to_file, one record at a time, so a large output is never
+        held in memory whole.
+        """
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = file_path + ".tmp"
+
+        with Metrics.default().span("write_output"), open(tmp_path, "w", encoding="utf-8") as f:
+            count = 0
+            for record in records:
+                f.write("[\n  " if count == 0 else ",\n  ")
+                f.write(json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+                count += 1
+            f.write("\n]" if count else "[]")
+        os.replace(tmp_path, file_path)
+
+        print(f"data written to {file_path}")
+        return count
+
 
     @staticmethod
     def load_text_file(file_path):
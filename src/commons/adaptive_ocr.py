@@ -0,0 +1,205 @@
+import threading
+import time
+
+import fitz
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.metrics import Metrics
+from commons.page_renderer import PageRenderer
+from commons.tesseract_backend import TesseractBackend
+
+_local = threading.local()
+
+DEFAULT_PASSES = [
+    {"dpi": 150, "threshold_block_size": 15, "threshold_c": 2},
+    {"dpi": 300, "threshold_block_size": 31, "threshold_c": 2},
+    {"dpi": 300, "threshold_block_size": 51, "threshold_c": 10}
+]
+
+
+class AdaptiveOcr:
+    """
+    Multi-pass OCR: every page starts at the first (cheapest) pass and only
+    moves on to the next pass while tesseract's word confidence is below
+    min_confidence.
+
+    A page whose overall confidence is fine but which has a few weak lines
+    does not get re-rendered as a whole; only those line regions are
+    clipped out and read again with the next pass.
+    """
+
+    def __init__(self, passes=None, min_confidence=None, lang="eng"):
+        adaptive_config = config.get(Co.OCR, {}).get(Co.ADAPTIVE, {})
+        self.passes = passes or adaptive_config.get(Co.PASSES, DEFAULT_PASSES)
+        self.min_confidence = min_confidence if min_confidence is not None \
+            else adaptive_config.get(Co.MIN_CONFIDENCE, 80)
+        self.lang = lang
+        self.renderer = PageRenderer()
+        self.records = []
+
+    @staticmethod
+    def default():
+        if not hasattr(_local, "adaptive_ocr"):
+            _local.adaptive_ocr = AdaptiveOcr()
+        return _local.adaptive_ocr
+
+    # ------------------------
+    # tesseract
+    # ------------------------
+    def _read_lines(self, gray):
+        """
+        Runs tesseract once and returns its lines in reading order as
+        dicts with text, confidence and pixel bounding box.
+        """
+        with Metrics.default().span("tesseract"):
+            data = TesseractBackend.default().image_to_data(gray, self.lang)
+
+        lines = {}
+        for i, word in enumerate(data["text"]):
+            if not word.strip():
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            left, top = data["left"][i], data["top"][i]
+            right, bottom = left + data["width"][i], top + data["height"][i]
+            line = lines.setdefault(key, {"words": [], "confs": [], "box": [left, top, right, bottom]})
+            line["words"].append(word)
+            line["confs"].append(float(data["conf"][i]))
+            box = line["box"]
+            line["box"] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+
+        result = []
+        for key in sorted(lines):
+            line = lines[key]
+            result.append({
+                "block": key[0],
+                "text": " ".join(line["words"]),
+                "confs": line["confs"],
+                "confidence": sum(line["confs"]) / len(line["confs"]),
+                "box": line["box"]
+            })
+        return result
+
+    @staticmethod
+    def _confidence(lines):
+        confs = [c for line in lines for c in line["confs"]]
+        return sum(confs) / len(confs) if confs else 0.0
+
+    @staticmethod
+    def _join(lines):
+        text = ""
+        previous_block = None
+        for line in lines:
+            if previous_block is not None and line["block"] != previous_block:
+                text += "\n"
+            text += line["text"] + "\n"
+            previous_block = line["block"]
+        return text
+
+    def _ocr(self, page, ocr_pass, clip=None):
+        pix, gray = self.renderer.render_for_ocr(
+            page, ocr_pass["dpi"], ocr_pass["threshold_block_size"], ocr_pass["threshold_c"], clip
+        )
+        return self._read_lines(gray), pix.width * pix.height
+
+    # ------------------------
+    # Page OCR
+    # ------------------------
+    def ocr_page(self, page, clip=None):
+        """
+        OCRs the page, or just the clip rectangle of it (one receipt of a
+        segmented page).
+        """
+        started = time.perf_counter()
+        area = fitz.Rect(clip) & page.rect if clip is not None else page.rect
+        max_scale = max(ocr_pass["dpi"] for ocr_pass in self.passes) / 72.0
+        record = {
+            "file": page.parent.name,
+            "page": page.number,
+            "passes": 0,
+            "regions_escalated": 0,
+            "pixels": 0,
+            # what a single render at the highest DPI would have cost
+            "full_pixels": int(area.width * max_scale) * int(area.height * max_scale)
+        }
+
+        # (confidence, pass index, lines) of the best pass so far; if no pass
+        # reaches min_confidence the most confident one wins
+        best = (-1.0, 0, [])
+        for index, ocr_pass in enumerate(self.passes):
+            pass_lines, pixels = self._ocr(page, ocr_pass, area if clip is not None else None)
+            record["passes"] += 1
+            record["pixels"] += pixels
+            pass_confidence = self._confidence(pass_lines)
+            if pass_confidence > best[0]:
+                best = (pass_confidence, index, pass_lines)
+            if pass_confidence >= self.min_confidence:
+                break
+        confidence, chosen, lines = best
+
+        # Page is good overall: give weak lines one more try at the next pass
+        if confidence >= self.min_confidence and chosen + 1 < len(self.passes):
+            next_pass = self.passes[chosen + 1]
+            scale = 72.0 / self.passes[chosen]["dpi"]
+            for i, line in enumerate(lines):
+                if line["confidence"] >= self.min_confidence:
+                    continue
+                left, top, right, bottom = line["box"]
+                pad = 4
+                line_clip = fitz.Rect(
+                    (left - pad) * scale, (top - pad) * scale,
+                    (right + pad) * scale, (bottom + pad) * scale
+                ) + (area.x0, area.y0, area.x0, area.y0)
+                line_clip &= area
+                if line_clip.is_empty:
+                    continue
+                region_lines, pixels = self._ocr(page, next_pass, line_clip)
+                record["pixels"] += pixels
+                record["regions_escalated"] += 1
+                if region_lines and self._confidence(region_lines) > line["confidence"]:
+                    lines[i] = {
+                        **line,
+                        "text": " ".join(region_line["text"] for region_line in region_lines),
+                        "confidence": self._confidence(region_lines)
+                    }
+
+        record["dpi"] = self.passes[chosen]["dpi"]
+        record["pass"] = chosen
+        record["confidence"] = confidence
+        record["seconds"] = time.perf_counter() - started
+        self.records.append(record)
+        return self._join(lines)
+
+    def pop_records(self):
+        records, self.records = self.records, []
+        return records
+
+    # ------------------------
+    # Stats
+    # ------------------------
+    def summarize(self, records=None):
+        """
+        Aggregates per-page records. pixels_vs_full compares the pixels
+        actually OCR'd with rendering every page once at the highest DPI.
+        """
+        records = self.records if records is None else records
+        if not records:
+            return {"pages": 0}
+
+        by_pass = {}
+        for record in records:
+            by_pass[record["pass"]] = by_pass.get(record["pass"], 0) + 1
+
+        seconds = [record["seconds"] for record in records]
+        return {
+            "pages": len(records),
+            "pages_by_pass": {
+                f"{self.passes[i]['dpi']}dpi#{i}": count for i, count in sorted(by_pass.items())
+            },
+            "regions_escalated": sum(record["regions_escalated"] for record in records),
+            "total_seconds": sum(seconds),
+            "mean_seconds": sum(seconds) / len(seconds),
+            "max_seconds": max(seconds),
+            "pixels_vs_full": sum(record["pixels"] for record in records) /
+                              max(1, sum(record["full_pixels"] for record in records))
+        }
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.FileUtils import FileUtils
+
+
+class BillStore:
+    """
+    SQLite index of the extracted bills, one row per bill, indexed by
+    employee, category, month and date, so the decision service can load
+    one employee or one month without parsing every output file.
+
+    The JSON files under src/model_output stay the source of truth: the
+    extractors write each output file through to the store as they save
+    it, and sync() re-imports any output file whose size or mtime no
+    longer matches what the store last saw (older runs, hand edits, files
+    removed), which costs one stat per file.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path=None, enabled=None):
+        store_config = config.get(Co.BILL_STORE, {})
+        self.path = path or store_config.get(Co.PATH, ".cache/bills.sqlite")
+        self.enabled = store_config.get(Co.ENABLED, True) if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def default():
+        with BillStore._default_lock:
+            if BillStore._default is None:
+                BillStore._default = BillStore()
+        return BillStore._default
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # several extractor processes may write at once
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS outputs (
+                    output_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    size INTEGER, mtime_ns INTEGER);
+                CREATE TABLE IF NOT EXISTS bills (
+                    output_key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    category TEXT, emp_id TEXT, emp_name TEXT, emp_month TEXT, date TEXT,
+                    bill TEXT NOT NULL,
+                    PRIMARY KEY (output_key, position));
+                CREATE INDEX IF NOT EXISTS bills_employee ON bills (model, emp_id, category, emp_month);
+                CREATE INDEX IF NOT EXISTS bills_month ON bills (model, category, emp_month);
+                CREATE INDEX IF NOT EXISTS bills_date ON bills (model, date);
+            """)
+        return self._conn
+
+    # ------------------------
+    # Keys
+    # ------------------------
+    @staticmethod
+    def output_key(output_path, output_root="src/model_output"):
+        """
+        <category folder>/<model>/<output file>, e.g. meal/<model>/IIIPL-1000_naveen_oct_amex.
+        """
+        return os.path.relpath(os.path.abspath(output_path), os.path.abspath(output_root)).replace(os.sep, "/")
+
+    # ------------------------
+    # Writes
+    # ------------------------
+    def _replace(self, conn, output_key, records, stat):
+        folder_category, model = output_key.split("/")[:2]
+        conn.execute("DELETE FROM bills WHERE output_key = ?", (output_key,))
+
+        def rows():
+            # generated as executemany goes, so records can be an iterator
+            for position, bill in enumerate(records):
+                # as the decision service did: the folder names a missing category
+                if not bill.get("category"):
+                    bill["category"] = folder_category
+                yield (output_key, position, model, bill.get("category"), bill.get("emp_id"),
+                       bill.get("emp_name"), bill.get("emp_month"), bill.get("date"),
+                       json.dumps(bill, ensure_ascii=False))
+
+        conn.executemany(
+            "INSERT INTO bills (output_key, position, model, category, emp_id, emp_name, emp_month, date, bill)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows())
+        conn.execute("INSERT OR REPLACE INTO outputs (output_key, model, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                     (output_key, model, stat.st_size, stat.st_mtime_ns))
+
+    def write_output(self, output_path, records, output_root="src/model_output"):
+        """
+        Replaces the bills of one extractor output file, just written to
+        output_path, with records (a list or any iterable of dicts).
+        """
+        if not self.enabled:
+            return
+        output_key = self.output_key(output_path, output_root)
+        with self._lock:
+            conn = self._connection()
+            self._replace(conn, output_key, (dict(record) for record in records), os.stat(output_path))
+            conn.commit()
+
+    def sync(self, output_root, model):
+        """
+        Brings the store in line with the output files of model under
+        output_root. Returns the number of output files re-imported.
+        """
+        current = {}
+        for category in sorted(os.listdir(output_root)):
+            model_dir = os.path.join(output_root, category, model)
+            if category == "policy" or not os.path.isdir(model_dir):
+                continue
+            for entry in os.scandir(model_dir):
+                if entry.is_file():
+                    current[f"{category}/{model}/{entry.name}"] = (entry.path, entry.stat())
+
+        imported = 0
+        with self._lock:
+            conn = self._connection()
+            known = {key: (size, mtime_ns) for key, size, mtime_ns in conn.execute(
+                "SELECT output_key, size, mtime_ns FROM outputs WHERE model = ?", (model,))}
+            for output_key in known.keys() - current.keys():
+                conn.execute("DELETE FROM bills WHERE output_key = ?", (output_key,))
+                conn.execute("DELETE FROM outputs WHERE output_key = ?", (output_key,))
+            for output_key, (path, stat) in sorted(current.items()):
+                if known.get(output_key) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                try:
+                    records = FileUtils.load_json_from_file(path)
+                except Exception as e:
+                    print(f"⚠️ Failed to load {output_key}: {e}")
+                    continue
+                self._replace(conn, output_key, records if isinstance(records, list) else [records], stat)
+                imported += 1
+            conn.commit()
+        if imported:
+            print(f"🗄 Bill store: re-imported {imported} output files")
+        return imported
+
+    # ------------------------
+    # Reads
+    # ------------------------
+    def bills(self, model, emp_id=None, category=None, month=None, date=None):
+        """
+        Bills of model, optionally narrowed to one employee, category
+        (meal, cab, ...), emp_month and bill date, in output file order.
+        """
+        query = "SELECT bill FROM bills WHERE model = ?"
+        params = [model]
+        for column, value in (("emp_id", emp_id), ("category", category), ("emp_month", month), ("date", date)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY output_key, position", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+
+from rapidfuzz import fuzz, process
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+
+def _trigrams(text):
+    grams = set()
+    for token in text.split():
+        token = token.strip(",.-#()/")
+        if len(token) < 3:
+            grams.add(token)
+            continue
+        grams.update(token[i:i + 3] for i in range(len(token) - 2))
+    grams.discard("")
+    return grams
+
+
+class ClientAddressRegistry:
+    """
+    Client office addresses from paths.clients_file (clients.json), loaded
+    once per process.
+
+    Addresses are lowercased up front and indexed by token trigrams per
+    client. best_score() only scores addresses sharing trigrams with the
+    pickup/drop text: the shortlist_size sharing the most, then the others
+    sharing at least min_trigram_overlap of the shorter string's trigrams,
+    with the shortlist's score as rapidfuzz's score_cutoff. Addresses below
+    that overlap are not scored at all, so unlike validate_ride's loop over
+    every address a pickup/drop with nothing in common with any site scores
+    0 instead of partial_ratio's noise (~40). Scores are memoized per
+    client and text next to the index they came from, since employees keep
+    taking the same routes.
+
+    The file is re-read when its mtime changes (checked at most every
+    reload_check_seconds), so a running batch picks up new client sites.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    MAX_MEMO = 100000
+
+    def __init__(self, path=None, shortlist_size=None, reload_check_seconds=None, min_trigram_overlap=None):
+        clients_config = config.get(Co.CLIENTS, {})
+        self.path = path or config.get(Co.PATHS, {}).get(Co.CLIENTS_FILE, "clients.json")
+        self.shortlist_size = shortlist_size or clients_config.get(Co.SHORTLIST_SIZE, 8)
+        self.min_trigram_overlap = min_trigram_overlap if min_trigram_overlap is not None \
+            else clients_config.get(Co.MIN_TRIGRAM_OVERLAP, 0.3)
+        self.reload_check_seconds = reload_check_seconds if reload_check_seconds is not None \
+            else clients_config.get(Co.RELOAD_CHECK_SECONDS, 2)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._clients = {}
+        self.load()
+
+    @staticmethod
+    def default():
+        with ClientAddressRegistry._default_lock:
+            if ClientAddressRegistry._default is None:
+                ClientAddressRegistry._default = ClientAddressRegistry()
+        return ClientAddressRegistry._default
+
+    # ------------------------
+    # Loading
+    # ------------------------
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        mtime = os.path.getmtime(self.path)
+
+        clients = {}
+        for client, addresses in raw.items():
+            normalized = [address.lower() for address in addresses]
+            index = {}
+            sizes = []
+            for i, address in enumerate(normalized):
+                grams = _trigrams(address)
+                sizes.append(len(grams))
+                for gram in grams:
+                    index.setdefault(gram, []).append(i)
+            # the memo lives with the index it was computed from, so a
+            # reload drops both at once
+            clients[client] = {"raw": list(addresses), "addresses": normalized, "index": index,
+                               "sizes": sizes, "memo": {}}
+
+        with self._lock:
+            self._clients = clients
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_check_seconds:
+            return False
+        self._checked_at = now
+        try:
+            changed = os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+        if changed:
+            print(f"🔄 Reloading client addresses from {self.path}")
+            self.load()
+        return changed
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def _client(self, client):
+        self.reload_if_changed()
+        return self._clients.get(client)
+
+    def clients(self):
+        self.reload_if_changed()
+        return list(self._clients)
+
+    def get(self, client, default=None):
+        """
+        The client's addresses as written in clients.json (dict-like access).
+        """
+        entry = self._client(client)
+        return entry["raw"] if entry else ([] if default is None else default)
+
+    def addresses(self, client):
+        """
+        The client's lowercased addresses.
+        """
+        entry = self._client(client)
+        return entry["addresses"] if entry else []
+
+    def shortlist(self, client, text):
+        """
+        Indexes of the client's addresses sharing the most trigrams with text.
+        """
+        entry = self._client(client)
+        return self._shortlist(entry, text) if entry else []
+
+    def _shortlist(self, entry, text):
+        return self._candidates(entry, text)[0]
+
+    def _candidates(self, entry, text):
+        """
+        (shortlist, rest): indexes of the shortlist_size addresses sharing
+        the most trigrams with text, and of the other addresses sharing at
+        least min_trigram_overlap of the shorter string's trigrams.
+        """
+        grams = _trigrams(text)
+        hits = {}
+        for gram in grams:
+            for i in entry["index"].get(gram, ()):
+                hits[i] = hits.get(i, 0) + 1
+        ranked = sorted(hits, key=lambda i: (-hits[i], i))
+        rest = [i for i in ranked[self.shortlist_size:]
+                if hits[i] >= self.min_trigram_overlap * min(len(grams), entry["sizes"][i])]
+        return ranked[:self.shortlist_size], rest
+
+    def best_score(self, client, *texts):
+        """
+        max(fuzz.partial_ratio(text, address)) over the given (lowercased)
+        texts and the client's addresses they share enough trigrams with, 0
+        when there are none.
+        """
+        entry = self._client(client)
+        if not entry:
+            return 0
+
+        memo = entry["memo"]
+        best = 0
+        for text in texts:
+            with self._lock:
+                score = memo.get(text)
+            if score is None:
+                score = self._text_score(entry, text)
+                with self._lock:
+                    if len(memo) >= self.MAX_MEMO:
+                        memo.clear()
+                    memo[text] = score
+            best = max(best, score)
+        return best
+
+    def _text_score(self, entry, text):
+        addresses = entry["addresses"]
+        best = 0
+        shortlist, rest = self._candidates(entry, text)
+        for i in shortlist:
+            best = max(best, fuzz.partial_ratio(text, addresses[i]))
+        if rest:
+            # anything that cannot beat the shortlist scores 0 and is skipped
+            match = process.extractOne(text, [addresses[i] for i in rest], scorer=fuzz.partial_ratio,
+                                       processor=None, score_cutoff=best)
+            if match is not None:
+                best = max(best, match[1])
+        return best
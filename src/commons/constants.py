@@ -1,4 +1,76 @@
 class Constants:
     LLM = "llm"
     TEMPERATURE = "temperature"
-    MODEL = "model"
\ No newline at end of file
+    MODEL = "model"
+    OCR = "ocr"
+    WORKERS = "workers"
+    DPI = "dpi"
+    THRESHOLD_BLOCK_SIZE = "threshold_block_size"
+    THRESHOLD_C = "threshold_c"
+    CACHE = "cache"
+    ENABLED = "enabled"
+    DIR = "dir"
+    MAX_MB = "max_mb"
+    MODE = "mode"
+    ADAPTIVE = "adaptive"
+    PASSES = "passes"
+    MIN_CONFIDENCE = "min_confidence"
+    BACKEND = "backend"
+    BATCH_SIZE = "batch_size"
+    BATCHING = "batching"
+    MAX_TOKENS = "max_tokens"
+    MAX_CONCURRENCY = "max_concurrency"
+    PATH = "path"
+    TTL_HOURS = "ttl_hours"
+    MAX_ENTRIES = "max_entries"
+    TEMPLATES = "templates"
+    DECISION = "decision"
+    ENGINE = "engine"
+    SHARD_MAX_GROUPS = "shard_max_groups"
+    SHARD_MAX_TOKENS = "shard_max_tokens"
+    RETRIES = "retries"
+    EXTRACTION = "extraction"
+    INCREMENTAL = "incremental"
+    MANIFEST_DIR = "manifest_dir"
+    DATABASE = "database"
+    HOST = "host"
+    PORT = "port"
+    NAME = "name"
+    USER = "user"
+    PASSWORD = "password"
+    MIN_CONNECTIONS = "min_connections"
+    MAX_CONNECTIONS = "max_connections"
+    CLIENTS = "clients"
+    PATHS = "paths"
+    CLIENTS_FILE = "clients_file"
+    SHORTLIST_SIZE = "shortlist_size"
+    MIN_TRIGRAM_OVERLAP = "min_trigram_overlap"
+    RELOAD_CHECK_SECONDS = "reload_check_seconds"
+    DUPLICATES = "duplicates"
+    NUM_PERM = "num_perm"
+    BANDS = "bands"
+    TEXT_THRESHOLD = "text_threshold"
+    IMAGE_DISTANCE = "image_distance"
+    PIPELINE = "pipeline"
+    OCR_WORKERS = "ocr_workers"
+    QUEUE_SIZE = "queue_size"
+    BATCH_WAIT_SECONDS = "batch_wait_seconds"
+    JSONL_DIR = "jsonl_dir"
+    SEGMENTATION = "segmentation"
+    MIN_GAP = "min_gap"
+    MIN_HEIGHT = "min_height"
+    BLANK_LEVEL = "blank_level"
+    METRICS = "metrics"
+    PROMETHEUS_PATH = "prometheus_path"
+    SUMMARY_PATH = "summary_path"
+    PLACEMENT = "placement"
+    BILL_STORE = "bill_store"
+    DAEMON = "daemon"
+    QUEUE_PATH = "queue_path"
+    POLL_SECONDS = "poll_seconds"
+    ROUTING = "routing"
+    SMALL_MODEL = "small_model"
+    KEY_FIELDS = "key_fields"
+    SUSPECT_NAME_SCORE = "suspect_name_score"
+    SUSPECT_ADDRESS_SCORE = "suspect_address_score"
+    PRICES = "prices"
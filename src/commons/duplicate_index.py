@@ -0,0 +1,315 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import cv2
+import fitz
+import numpy as np
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.receipt_segmenter import ReceiptSegmenter, UNIT_SEPARATOR, source_name
+
+MANUAL = "MANUAL"
+MERSENNE = (1 << 31) - 1
+SHINGLE = 5
+IMAGE_CHUNKS = 8
+
+
+def _text(value):
+    # template records store newlines as a literal "\n"
+    return re.sub(r"\s+", " ", (value or "").replace("\\n", " ")).strip().lower()
+
+
+def _amount(value):
+    try:
+        return round(float(value), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+class DuplicateIndex:
+    """
+    Persistent index of every extracted receipt, used to catch the same
+    receipt claimed twice in a month, again in a later month or by another
+    employee.
+
+    Three signals are stored per record, each with its own lookup table so
+    a check never scans the whole index:
+      - the printed ride/bill id (MANUAL ids are ignored),
+      - a MinHash signature of the OCR text, bucketed by LSH bands,
+      - a 64-bit dHash of the first rendered page, split into 8-bit chunks
+        (two hashes within IMAGE_CHUNKS - 1 bits share at least one chunk).
+
+    A record is a duplicate of an earlier-registered record from another
+    file when the ids match, when the estimated text similarity is at
+    least text_threshold with the same amount, or when the page hashes are
+    within image_distance bits with the same amount and date. Receipts of
+    one provider share a layout (Rapido receipts are 0-6 bits and ~0.8
+    text similarity apart), so the text and image signals only count when
+    one of the two records has no printed id: two different printed ids
+    are two different rides. The earliest claim stays valid; only the
+    later ones are flagged.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path=None, num_perm=None, bands=None, text_threshold=None, image_distance=None,
+                 enabled=None):
+        duplicates_config = config.get(Co.DUPLICATES, {})
+        self.path = path or duplicates_config.get(Co.PATH, ".cache/duplicates.sqlite")
+        self.num_perm = num_perm or duplicates_config.get(Co.NUM_PERM, 64)
+        self.bands = bands or duplicates_config.get(Co.BANDS, 16)
+        self.text_threshold = text_threshold or duplicates_config.get(Co.TEXT_THRESHOLD, 0.9)
+        self.image_distance = min(IMAGE_CHUNKS - 1, image_distance if image_distance is not None
+                                  else duplicates_config.get(Co.IMAGE_DISTANCE, 6))
+        self.enabled = duplicates_config.get(Co.ENABLED, True) if enabled is None else enabled
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be a multiple of bands ({self.bands})")
+
+        # fixed seed: signatures must stay comparable across runs
+        rng = np.random.default_rng(20241)
+        self._perm_a = rng.integers(1, MERSENNE, self.num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, MERSENNE, self.num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def default():
+        with DuplicateIndex._default_lock:
+            if DuplicateIndex._default is None:
+                DuplicateIndex._default = DuplicateIndex()
+        return DuplicateIndex._default
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS receipts (
+                    receipt_key TEXT PRIMARY KEY,
+                    file_key TEXT NOT NULL,
+                    category TEXT, emp_id TEXT, emp_month TEXT, filename TEXT,
+                    record_id TEXT, amount REAL, date TEXT,
+                    minhash BLOB, dhash INTEGER,
+                    first_seen REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS receipts_file ON receipts (file_key);
+                CREATE INDEX IF NOT EXISTS receipts_id ON receipts (category, record_id);
+                CREATE TABLE IF NOT EXISTS text_bands (band INTEGER, bucket TEXT, receipt_key TEXT);
+                CREATE INDEX IF NOT EXISTS text_bands_bucket ON text_bands (band, bucket);
+                CREATE INDEX IF NOT EXISTS text_bands_key ON text_bands (receipt_key);
+                CREATE TABLE IF NOT EXISTS image_chunks (chunk INTEGER, value INTEGER, receipt_key TEXT);
+                CREATE INDEX IF NOT EXISTS image_chunks_value ON image_chunks (chunk, value);
+                CREATE INDEX IF NOT EXISTS image_chunks_key ON image_chunks (receipt_key);
+            """)
+        return self._conn
+
+    # ------------------------
+    # Signatures
+    # ------------------------
+    def minhash(self, text):
+        text = _text(text)
+        if len(text) < SHINGLE:
+            return None
+        shingles = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64) % MERSENNE
+        permuted = (hashes[:, None] * self._perm_a[None, :] + self._perm_b[None, :]) % MERSENNE
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_buckets(self, signature):
+        rows = self.num_perm // self.bands
+        return [hashlib.sha1(signature[band * rows:(band + 1) * rows].tobytes()).hexdigest()[:16]
+                for band in range(self.bands)]
+
+    @staticmethod
+    def image_hash(file_path, unit_id=None):
+        """
+        dHash of the first page rendered at 72 dpi (of the receipt unit's
+        region, for a unit id such as file#p2r3), or None if it cannot be
+        rendered.
+        """
+        try:
+            with fitz.open(file_path) as doc:
+                page_num, clip = 0, None
+                if unit_id is not None and UNIT_SEPARATOR in unit_id:
+                    units = ReceiptSegmenter.default().segment(doc, source_name(unit_id))
+                    page_num, clip = next((n, c) for u, n, c in units if u == unit_id)
+                pix = doc[page_num].get_pixmap(colorspace=fitz.csGRAY, alpha=False, clip=clip)
+                gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+        except Exception:
+            return None
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        value = 0
+        for bit in bits:
+            value = (value << 1) | int(bit)
+        # stored as SQLite INTEGER, which is signed 64-bit
+        return value - (1 << 64) if value >= (1 << 63) else value
+
+    @staticmethod
+    def _chunks(dhash):
+        unsigned = dhash & ((1 << 64) - 1)
+        return [(unsigned >> (8 * i)) & 0xFF for i in range(IMAGE_CHUNKS)]
+
+    # ------------------------
+    # Keys
+    # ------------------------
+    @staticmethod
+    def file_key(category, record):
+        # receipt units of one document (file#p1r2) share the file's key, so
+        # they are never compared with each other
+        filename = source_name(record.get("filename") or "")
+        return f"{category}|{record.get('emp_id')}|{record.get('emp_month')}|{filename}"
+
+    @staticmethod
+    def unit_key(category, record):
+        return f"{category}|{record.get('emp_id')}|{record.get('emp_month')}|{record.get('filename')}"
+
+    @staticmethod
+    def record_id(record):
+        record_id = record.get("id")
+        if not record_id or str(record_id).startswith(MANUAL):
+            return None
+        return str(record_id)
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def _candidates(self, conn, category, record_id, buckets, dhash):
+        keys = set()
+        if record_id is not None:
+            keys.update(row[0] for row in conn.execute(
+                "SELECT receipt_key FROM receipts WHERE category = ? AND record_id = ?", (category, record_id)))
+        for band, bucket in enumerate(buckets or []):
+            keys.update(row[0] for row in conn.execute(
+                "SELECT receipt_key FROM text_bands WHERE band = ? AND bucket = ?", (band, bucket)))
+        if dhash is not None:
+            for chunk, value in enumerate(self._chunks(dhash)):
+                keys.update(row[0] for row in conn.execute(
+                    "SELECT receipt_key FROM image_chunks WHERE chunk = ? AND value = ?", (chunk, value)))
+        return keys
+
+    def matches(self, category, record, signature, dhash, file_key, first_seen):
+        """
+        Earlier-registered records from other files that record duplicates.
+        """
+        conn = self._connection()
+        record_id = self.record_id(record)
+        amount = _amount(record.get("amount"))
+        buckets = self.band_buckets(signature) if signature is not None else None
+
+        found = []
+        for key in self._candidates(conn, category, record_id, buckets, dhash):
+            row = conn.execute(
+                "SELECT file_key, emp_id, emp_month, filename, record_id, amount, date, minhash, dhash, first_seen"
+                " FROM receipts WHERE receipt_key = ? AND category = ?", (key, category)).fetchone()
+            if row is None or row[0] == file_key or row[9] > first_seen:
+                continue
+            other_file, emp_id, emp_month, filename, other_id, other_amount, other_date, other_minhash, \
+                other_dhash, _ = row
+
+            reasons = []
+            if record_id is not None and other_id == record_id:
+                reasons.append("id")
+            # both printed an id: the layout signals cannot tell two rides apart
+            layout = record_id is None or other_id is None
+            if layout and signature is not None and other_minhash is not None and amount == other_amount:
+                similarity = float(np.mean(np.frombuffer(other_minhash, dtype=np.uint32) == signature))
+                if similarity >= self.text_threshold:
+                    reasons.append("text")
+            if layout and dhash is not None and other_dhash is not None and amount == other_amount \
+                    and record.get("date") == other_date:
+                if bin((dhash ^ other_dhash) & ((1 << 64) - 1)).count("1") <= self.image_distance:
+                    reasons.append("image")
+            if reasons:
+                found.append({
+                    "emp_id": emp_id,
+                    "emp_month": emp_month,
+                    "filename": filename,
+                    "id": other_id,
+                    "matched_on": reasons
+                })
+        return found
+
+    # ------------------------
+    # Registration
+    # ------------------------
+    def flag(self, category, records, file_paths=None):
+        """
+        Registers the records (replacing what their files, or receipt units,
+        registered before) and adds is_duplicate / duplicate_of to each
+        record's validation. file_paths maps filename → receipt path, for the
+        page hash.
+        """
+        if not self.enabled:
+            return records
+        file_paths = file_paths or {}
+        image_hashes = {}
+        positions = {}
+
+        with self._lock:
+            conn = self._connection()
+            first_seen = {}
+            units = {}
+            for record in records:
+                file_key = self.file_key(category, record)
+                units[self.unit_key(category, record)] = file_key
+                if file_key not in first_seen:
+                    row = conn.execute("SELECT MIN(first_seen) FROM receipts WHERE file_key = ?",
+                                       (file_key,)).fetchone()
+                    first_seen[file_key] = row[0] if row[0] is not None else time.time()
+            for unit_key, file_key in units.items():
+                stale = [r[0] for r in conn.execute(
+                    "SELECT receipt_key FROM receipts WHERE file_key = ? AND substr(receipt_key, 1, ?) = ?",
+                    (file_key, len(unit_key) + 1, unit_key + "|"))]
+                conn.executemany("DELETE FROM text_bands WHERE receipt_key = ?", [(key,) for key in stale])
+                conn.executemany("DELETE FROM image_chunks WHERE receipt_key = ?", [(key,) for key in stale])
+                conn.executemany("DELETE FROM receipts WHERE receipt_key = ?", [(key,) for key in stale])
+
+            for record in records:
+                file_key = self.file_key(category, record)
+                unit_key = self.unit_key(category, record)
+                position = positions.get(unit_key, 0)
+                positions[unit_key] = position + 1
+                receipt_key = f"{unit_key}|{position}"
+
+                filename = record.get("filename")
+                if filename not in image_hashes:
+                    path = file_paths.get(filename) or file_paths.get(source_name(filename or ""))
+                    image_hashes[filename] = self.image_hash(path, filename) if path else None
+                dhash = image_hashes[filename]
+                signature = self.minhash(record.get("ocr"))
+
+                duplicates = self.matches(category, record, signature, dhash, file_key, first_seen[file_key])
+                validation = record.setdefault("validation", {})
+                validation["is_duplicate"] = bool(duplicates)
+                validation["duplicate_of"] = duplicates
+                if "is_valid" in validation:
+                    validation["is_valid"] = validation["is_valid"] and not duplicates
+
+                conn.execute(
+                    "INSERT INTO receipts (receipt_key, file_key, category, emp_id, emp_month, filename, record_id,"
+                    " amount, date, minhash, dhash, first_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (receipt_key, file_key, category, record.get("emp_id"), record.get("emp_month"), filename,
+                     self.record_id(record), _amount(record.get("amount")), record.get("date"),
+                     signature.tobytes() if signature is not None else None, dhash, first_seen[file_key])
+                )
+                if signature is not None:
+                    conn.executemany("INSERT INTO text_bands (band, bucket, receipt_key) VALUES (?, ?, ?)",
+                                     [(band, bucket, receipt_key)
+                                      for band, bucket in enumerate(self.band_buckets(signature))])
+                if dhash is not None:
+                    conn.executemany("INSERT INTO image_chunks (chunk, value, receipt_key) VALUES (?, ?, ?)",
+                                     [(chunk, value, receipt_key)
+                                      for chunk, value in enumerate(self._chunks(dhash))])
+            conn.commit()
+
+        flagged = sum(1 for record in records if record["validation"]["is_duplicate"])
+        if flagged:
+            print(f"♊ {flagged} of {len(records)} receipts look like earlier claims")
+        return records
@@ -0,0 +1,283 @@
+import json
+import os
+
+from rapidfuzz import fuzz, process
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.ocr_cache import OcrCache
+from commons.receipt_segmenter import UNIT_SEPARATOR, source_name, unit_order
+
+# an LLM-echoed filename this close to exactly one processed file is taken as that file
+FILENAME_MATCH_SCORE = 90
+# where a stored record's OCR text starts in the manifest's OCR file
+OCR_OFFSET = "_ocr_offset"
+
+
+class ExtractionManifest:
+    """
+    Per-folder record of which receipt files have been extracted, their
+    content hash and the validated records they produced.
+
+    changed_files() narrows a folder listing down to files that are new or
+    whose bytes changed and forgets files that were deleted; apply() stores
+    the records of the files just processed; records() gives the merged
+    output for the whole folder. Manifests live under
+    extraction.manifest_dir, outside src/model_output, so the decision
+    service never mistakes them for bills.
+
+    The records' OCR text, by far their largest field, is kept out of
+    memory: apply() appends it to an OCR file next to the manifest (one JSON
+    string per line) and the record keeps its offset; iter_records() reads
+    it back one record at a time. save() copies the live texts to a fresh
+    OCR file, so texts of replaced records do not pile up.
+    """
+
+    VERSION = 2
+
+    def __init__(self, manifest_path, output_path):
+        self.manifest_path = manifest_path
+        self.output_path = output_path
+        self.entries = {}
+        self.deleted = []
+        self.ocr_file = None
+        self._pending = {}
+        self._applied = {}
+        self.load()
+
+    @staticmethod
+    def for_output(output_path):
+        """
+        Manifest for an extractor output file such as
+        src/model_output/commute/<model>/<folder>.
+        """
+        manifest_dir = config.get(Co.EXTRACTION, {}).get(Co.MANIFEST_DIR, ".cache/manifests")
+        relative = os.path.relpath(os.path.abspath(output_path), os.path.abspath("src/model_output"))
+        return ExtractionManifest(os.path.join(manifest_dir, relative + ".json"), output_path)
+
+    def load(self):
+        # Without the output file the stored records are of no use: start over
+        self.entries = {}
+        self.ocr_file = None
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.output_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # version 1 manifests kept the OCR text in the records; save() moves it out
+        if data.get("version") in (1, self.VERSION):
+            self.entries = data.get("files", {})
+            self.ocr_file = data.get("ocr_file")
+
+    def _ocr_path(self, ocr_file):
+        return os.path.join(os.path.dirname(self.manifest_path), ocr_file)
+
+    def save(self):
+        """
+        Writes the manifest with its records' OCR texts copied to a new OCR
+        file. The manifest is replaced before the old OCR file is deleted,
+        so a manifest on disk always points at a complete OCR file.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        previous = self.ocr_file
+        generation = int(previous.rsplit(".", 3)[-3]) + 1 if previous else 1
+        self.ocr_file = f"{os.path.basename(self.manifest_path)}.{generation}.ocr.jsonl"
+
+        source = open(self._ocr_path(previous), "rb") if previous and os.path.exists(
+            self._ocr_path(previous)) else None
+        try:
+            with open(self._ocr_path(self.ocr_file), "wb") as target:
+                for entry in self.entries.values():
+                    for record in entry["records"]:
+                        text = self._read_ocr(source, record)
+                        record[OCR_OFFSET] = target.tell()
+                        target.write(json.dumps(text, ensure_ascii=False).encode("utf-8") + b"\n")
+                        if "ocr" in record:
+                            record["ocr"] = None
+        finally:
+            if source is not None:
+                source.close()
+
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "ocr_file": self.ocr_file, "files": self.entries}, f,
+                      indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        if previous and previous != self.ocr_file and os.path.exists(self._ocr_path(previous)):
+            os.remove(self._ocr_path(previous))
+
+    # ------------------------
+    # OCR text
+    # ------------------------
+    @staticmethod
+    def _read_ocr(source, record):
+        """
+        The OCR text of a stored record, from source (the open OCR file) or,
+        for records not moved out yet, from the record itself.
+        """
+        if OCR_OFFSET not in record:
+            return record.get("ocr")
+        if source is None:
+            # the OCR file was removed by hand
+            return None
+        source.seek(record[OCR_OFFSET])
+        return json.loads(source.readline())
+
+    def _store_ocr(self, records):
+        """
+        Appends the records' OCR texts to the current OCR file and leaves
+        the offsets in their place.
+        """
+        if self.ocr_file is None:
+            self.ocr_file = f"{os.path.basename(self.manifest_path)}.0.ocr.jsonl"
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self._ocr_path(self.ocr_file), "ab") as f:
+            for record in records:
+                if "ocr" not in record or OCR_OFFSET in record:
+                    continue
+                record[OCR_OFFSET] = f.tell()
+                f.write(json.dumps(record["ocr"], ensure_ascii=False).encode("utf-8") + b"\n")
+                record["ocr"] = None
+
+    @staticmethod
+    def _fingerprint(file_path):
+        stat = os.stat(file_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def changed_files(self, files, force=False):
+        """
+        files: (name, path) pairs for the whole folder. Returns the pairs that
+        need extracting and drops manifest entries of files no longer there.
+        The size/mtime check avoids hashing files that were not touched;
+        force=True returns every file (a full run that refreshes the manifest).
+        """
+        names = {name for name, _ in files}
+        self.deleted = [name for name in self.entries if name not in names]
+        for name in self.deleted:
+            del self.entries[name]
+
+        changed = []
+        self._pending = {}
+        self._applied = {}
+        for name, path in files:
+            fingerprint = self._fingerprint(path)
+            entry = self.entries.get(name)
+            if not force and entry and entry["size"] == fingerprint["size"] \
+                    and entry["mtime"] == fingerprint["mtime"]:
+                continue
+            fingerprint["sha256"] = OcrCache.file_hash(path)
+            if not force and entry and entry["sha256"] == fingerprint["sha256"]:
+                # touched but identical: just remember the new mtime
+                entry.update(fingerprint)
+                continue
+            self._pending[name] = fingerprint
+            changed.append((name, path))
+
+        print(f"🧾 Manifest: {len(changed)} new/changed, {len(self.deleted)} deleted, "
+              f"{len(files) - len(changed)} unchanged")
+        return changed
+
+    def apply(self, processed_names, records):
+        """
+        Stores records for the files in processed_names (which replaces
+        whatever those files produced before). Names may be receipt unit ids
+        (file#p1r2, see ReceiptSegmenter); the records of all units of a file
+        are collected under the file, also over several calls. Files missing
+        from processed_names, e.g. because their LLM batch failed, stay
+        pending and are picked up again by the next run.
+
+        A record's filename is the one the LLM echoed back. When it is not
+        exactly a processed file, the file it names is looked up ignoring
+        case and extension, then by fuzzy match. A record that still fits no
+        file is dropped, and the processed files left without any record
+        stay pending (see revert()), so their bills are retried instead of
+        lost.
+        """
+        files = list(dict.fromkeys(source_name(name) for name in processed_names))
+        for name in files:
+            if name in self._pending:
+                # the previous entry is kept until the run is over, see revert()
+                self._applied[name] = (self._pending[name], self.entries.get(name))
+                self.entries[name] = {**self._pending.pop(name), "records": []}
+        files = sorted(name for name in files if name in self._applied)
+
+        unmatched = []
+        filled = set()
+        for record in records:
+            filename = record.get("filename") or ""
+            name = self._match_file(source_name(filename), files)
+            if name is None:
+                unmatched.append(filename)
+                continue
+            if name != source_name(filename):
+                print(f"⚠️ Record filename {filename!r} taken as {name!r}")
+                record["filename"] = name + filename[len(source_name(filename)):]
+            self.entries[name]["records"].append(dict(record))
+            filled.add(name)
+        self._store_ocr(record for name in filled for record in self.entries[name]["records"])
+
+        if unmatched:
+            empty = [name for name in files if name not in filled]
+            print(f"⚠️ Records for unknown files {unmatched} not added to the manifest"
+                  + (f"; {empty} stay pending" if empty else ""))
+            self.revert(empty)
+
+    @staticmethod
+    def _match_file(name, files):
+        if name in files:
+            return name
+        lowered = {}
+        for file in files:
+            lowered.setdefault(file.lower(), file)
+        key = os.path.splitext(name)[0].lower() if UNIT_SEPARATOR not in name else name.lower()
+        if key in lowered:
+            return lowered[key]
+        if not name or not files:
+            return None
+        best = process.extract(name, files, scorer=fuzz.ratio, limit=2, score_cutoff=FILENAME_MATCH_SCORE)
+        # an ambiguous match is no match
+        if len(best) == 1 or (len(best) == 2 and best[0][1] > best[1][1]):
+            return best[0][0]
+        return None
+
+    def revert(self, names):
+        """
+        Undoes apply() for the files of names (file names or unit ids): their
+        previous entry is restored and they are pending again. Used when only
+        some units of a file made it through.
+        """
+        for name in dict.fromkeys(source_name(name) for name in names):
+            if name not in self._applied:
+                continue
+            fingerprint, previous = self._applied.pop(name)
+            self._pending[name] = fingerprint
+            if previous is None:
+                self.entries.pop(name, None)
+            else:
+                self.entries[name] = previous
+
+    def records(self):
+        """
+        All stored records, in filename order like FileUtils.list_receipt_files.
+        """
+        return list(self.iter_records())
+
+    def iter_records(self):
+        """
+        records() one at a time, each with its OCR text read back, so only
+        one text is in memory at once.
+        """
+        path = self._ocr_path(self.ocr_file) if self.ocr_file else None
+        source = open(path, "rb") if path and os.path.exists(path) else None
+        try:
+            for name in sorted(self.entries):
+                for record in sorted(self.entries[name]["records"],
+                                     key=lambda record: unit_order(record.get("filename") or "")):
+                    if OCR_OFFSET not in record:
+                        yield dict(record)
+                        continue
+                    text = self._read_ocr(source, record)
+                    yield {key: text if key == "ocr" else value for key, value in record.items()
+                           if key != OCR_OFFSET}
+        finally:
+            if source is not None:
+                source.close()
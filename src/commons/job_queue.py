@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable local job queue in SQLite, shared by the worker daemon and the
+    job client (any number of processes).
+
+    A job is a kind (folder, batch, decide), a JSON payload and a target:
+    jobs with the same target (e.g. one resources folder) never run at the
+    same time, so two runs never race on one extraction manifest. claim()
+    hands out the oldest runnable job inside a write transaction, so two
+    workers never get the same one. Jobs left running by a daemon that
+    died are queued again by requeue_running() when the next one starts.
+    """
+
+    def __init__(self, path=None):
+        daemon_config = config.get(Co.DAEMON, {})
+        self.path = path or daemon_config.get(Co.QUEUE_PATH, ".cache/jobs.sqlite")
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    target TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    submitted_at REAL NOT NULL, started_at REAL, finished_at REAL,
+                    result TEXT, error TEXT);
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            """)
+        return self._conn
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job_id, kind, target, payload, status, worker, submitted_at, started_at, finished_at, result, error = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "target": target,
+            "payload": json.loads(payload),
+            "status": status,
+            "worker": worker,
+            "submitted_at": submitted_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "result": json.loads(result) if result is not None else None,
+            "error": error
+        }
+
+    # ------------------------
+    # Client side
+    # ------------------------
+    def submit(self, kind, payload, target=None):
+        """
+        Queues a job. Returns its id.
+        """
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO jobs (kind, target, payload, status, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, target, json.dumps(payload, ensure_ascii=False), QUEUED, time.time()))
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def wait(self, job_ids, timeout=None, poll_seconds=0.5):
+        """
+        Blocks until every job is done or failed (or timeout seconds have
+        passed). Returns the jobs, in the order given.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            jobs = [self.get(job_id) for job_id in job_ids]
+            if all(job is None or job["status"] in (DONE, FAILED) for job in jobs):
+                return jobs
+            if deadline is not None and time.monotonic() >= deadline:
+                return jobs
+            time.sleep(poll_seconds)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    # ------------------------
+    # Worker side
+    # ------------------------
+    def claim(self, worker):
+        """
+        Marks the oldest queued job whose target is not already running as
+        running by worker and returns it; None when there is nothing to do.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND (target IS NULL OR target NOT IN"
+                    " (SELECT target FROM jobs WHERE status = ? AND target IS NOT NULL)) ORDER BY id LIMIT 1",
+                    (QUEUED, RUNNING)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = ?, worker = ?, started_at = ? WHERE id = ?",
+                                 (RUNNING, worker, time.time(), row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._job(row)
+        if job is not None:
+            job["status"], job["worker"] = RUNNING, worker
+        return job
+
+    def finish(self, job_id, result=None, error=None):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                (FAILED if error is not None else DONE, time.time(),
+                 json.dumps(result, ensure_ascii=False, default=str), error, job_id))
+
+    def requeue_running(self):
+        """
+        Queues jobs marked running again (their daemon is gone). Returns
+        how many there were.
+        """
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+        return cursor.rowcount
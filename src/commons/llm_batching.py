@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.llm_cache import REFRESH
+
+# Rough size of a token for English receipt text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+class LLMBatcher:
+    """
+    Splits a folder's receipts into chunks that fit a token budget and runs
+    them concurrently through a chain's async batch API.
+
+    Receipts are packed greedily in folder order, so a chunk is always a
+    contiguous run of receipts; one that is larger than the budget on its
+    own gets a chunk to itself. Parsed records are merged back in the order
+    of the receipts they came from.
+    """
+
+    def __init__(self, max_tokens=None, max_concurrency=None, retries=None):
+        batching_config = config.get(Co.LLM, {}).get(Co.BATCHING, {})
+        self.max_tokens = max_tokens or batching_config.get(Co.MAX_TOKENS, 6000)
+        self.max_concurrency = max_concurrency or batching_config.get(Co.MAX_CONCURRENCY, 4)
+        self.retries = batching_config.get(Co.RETRIES, 1) if retries is None else retries
+        self.failed_chunks = []
+        self.chunk_count = 0
+
+    @staticmethod
+    def estimate_tokens(value):
+        if not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False)
+        return len(value) // CHARS_PER_TOKEN + 1
+
+    def plan(self, receipts, overhead_text=""):
+        """
+        receipts: list of {name: text}. overhead_text is whatever is sent with
+        every chunk (system prompt, format instructions) and is taken off the
+        budget up front.
+        """
+        budget = max(1, self.max_tokens - self.estimate_tokens(overhead_text))
+        chunks = []
+        chunk = []
+        chunk_tokens = 0
+        for receipt in receipts:
+            tokens = self.estimate_tokens(receipt)
+            if chunk and chunk_tokens + tokens > budget:
+                chunks.append(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(receipt)
+            chunk_tokens += tokens
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    async def _abatch(self, chain, inputs, refresh=False):
+        return await chain.abatch(
+            inputs,
+            config={"max_concurrency": self.max_concurrency, "configurable": {REFRESH: refresh}},
+            return_exceptions=True
+        )
+
+    def run(self, chain, receipts, build_input, overhead_text=""):
+        """
+        Runs every chunk through chain and returns the merged list of parsed
+        records (the .root of each RootModel result). build_input turns a
+        chunk into the chain's input dict. Chunks that fail are reported and
+        retried up to self.retries times with the LLM cache bypassed (a
+        failed answer is never replayed); the ones that still fail are
+        reported and kept in self.failed_chunks, the other chunks still come
+        back.
+        """
+        chunks = self.plan(receipts, overhead_text)
+        self.chunk_count = len(chunks)
+        print(f"📦 {len(receipts)} receipts in {len(chunks)} LLM batches "
+              f"(≤{self.max_tokens} tokens, {self.max_concurrency} concurrent)")
+
+        results = asyncio.run(self._abatch(chain, [build_input(chunk) for chunk in chunks]))
+        for attempt in range(self.retries):
+            failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+            if not failed:
+                break
+            print(f"🔁 Retrying {len(failed)} failed LLM batches (attempt {attempt + 2})")
+            retried = asyncio.run(self._abatch(chain, [build_input(chunks[i]) for i in failed], refresh=True))
+            for i, result in zip(failed, retried):
+                results[i] = result
+
+        self.failed_chunks = []
+        records = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                names = [name for receipt in chunk for name in receipt]
+                print(f"❌ LLM batch failed for {names}: {result}")
+                self.failed_chunks.append(chunk)
+                continue
+            records.extend(result.root)
+
+        return self.merge_in_order(records, receipts)
+
+    def invoke(self, chain, chain_input):
+        """
+        Runs a single chunk's input through chain (the streaming pipeline's
+        micro-batches), retried like run(): up to self.retries more times
+        with the LLM cache bypassed. Raises the last error.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return chain.invoke(chain_input, config={"configurable": {REFRESH: attempt > 0}})
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f"🔁 Retrying failed LLM batch (attempt {attempt + 2}): {e}")
+
+    def all_failed(self):
+        """
+        True when the last run had chunks and every one of them failed.
+        """
+        return bool(self.chunk_count) and len(self.failed_chunks) == self.chunk_count
+
+    def failure_summary(self):
+        pending = sum(len(chunk) for chunk in self.failed_chunks)
+        return f"{len(self.failed_chunks)} of {self.chunk_count} LLM batches failed, {pending} receipts left pending"
+
+    @staticmethod
+    def merge_in_order(records, receipts):
+        """
+        Orders records by the position of their filename in receipts.
+        Records with an unknown filename keep their relative order at the end.
+        """
+        order = {}
+        for receipt in receipts:
+            for name in receipt:
+                order.setdefault(name, len(order))
+        return sorted(records, key=lambda record: order.get(record.filename, len(order)))
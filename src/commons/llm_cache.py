@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.metrics import Metrics
+
+BYPASS_ENV = "LLM_CACHE_BYPASS"
+# Pass {"configurable": {REFRESH: True}} when invoking a wrapped chain to skip
+# the lookup and overwrite the entry, e.g. when retrying an unusable answer
+REFRESH = "llm_cache_refresh"
+# response_metadata key of the cache entry a wrapped model's message is stored under
+CACHE_KEY = "llm_cache_key"
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses shared by the extraction, policy
+    and decision chains.
+
+    wrap() puts the cache between a prompt and a chat model, so chains stay
+    prompt | model | parser. The key covers the model name, temperature,
+    prompt template, system prompt and the rest of the formatted input, so
+    any change to one of them is a miss. Entries expire after ttl_hours and
+    the least recently used ones are dropped beyond max_entries.
+
+    An answer that then fails to parse must not be replayed for ttl_hours:
+    parse through parsed(), or call discard(message) on failure, to drop it.
+
+    Set llm.cache.enabled: false or the LLM_CACHE_BYPASS=1 environment
+    variable to always call the model (responses are then not stored).
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path=None, ttl_hours=None, max_entries=None, enabled=None):
+        cache_config = config.get(Co.LLM, {}).get(Co.CACHE, {})
+        self.path = path or cache_config.get(Co.PATH, ".cache/llm.sqlite")
+        self.ttl_seconds = (ttl_hours or cache_config.get(Co.TTL_HOURS, 720)) * 3600
+        self.max_entries = max_entries or cache_config.get(Co.MAX_ENTRIES, 10000)
+        self.enabled = cache_config.get(Co.ENABLED, True) if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def default():
+        with LLMCache._default_lock:
+            if LLMCache._default is None:
+                LLMCache._default = LLMCache()
+        return LLMCache._default
+
+    @property
+    def bypassed(self):
+        return not self.enabled or os.environ.get(BYPASS_ENV, "") not in ("", "0")
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_access ON llm_cache (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    # ------------------------
+    # Keys
+    # ------------------------
+    @staticmethod
+    def template_text(prompt):
+        """
+        Text of a ChatPromptTemplate's message templates, for the cache key.
+        """
+        parts = []
+        for message in getattr(prompt, "messages", []):
+            template = getattr(getattr(message, "prompt", None), "template", None)
+            parts.append(f"{type(message).__name__}:{template if template is not None else message!r}")
+        return "\n".join(parts) if parts else repr(prompt)
+
+    @staticmethod
+    def make_key(model, temperature, template, system_prompt, user_input):
+        return _sha256(json.dumps({
+            "model": model,
+            "temperature": temperature,
+            "template": _sha256(template),
+            "system_prompt": _sha256(system_prompt),
+            "input": _sha256(user_input)
+        }, sort_keys=True))
+
+    # ------------------------
+    # Storage
+    # ------------------------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl_seconds < now:
+                if row is not None:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+
+    def discard(self, message):
+        """
+        Drops the cache entry a wrapped model's message came from or was
+        stored under (no-op for messages that were never cached).
+        """
+        key = (getattr(message, "response_metadata", None) or {}).get(CACHE_KEY)
+        if key is not None:
+            self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "bypassed": self.bypassed
+        }
+
+    # ------------------------
+    # Chain integration
+    # ------------------------
+    def wrap(self, llm, prompt, model=None, temperature=None):
+        """
+        Returns a runnable to use in place of llm after prompt. It takes the
+        formatted prompt value and returns an AIMessage, from the cache when
+        possible.
+        """
+        model = model or getattr(llm, "model_name", None) or getattr(llm, "model", None)
+        temperature = temperature if temperature is not None else getattr(llm, "temperature", None)
+        template = self.template_text(prompt)
+
+        def key_for(prompt_value):
+            messages = prompt_value.to_messages()
+            system_prompt = "\n".join(str(m.content) for m in messages if m.type == "system")
+            user_input = "\n".join(str(m.content) for m in messages if m.type != "system")
+            return self.make_key(model, temperature, template, system_prompt, user_input)
+
+        def refresh(config):
+            return bool((config or {}).get("configurable", {}).get(REFRESH))
+
+        metrics = Metrics.default()
+
+        def call(prompt_value, config, cache):
+            metrics.count("llm_calls", cache=cache)
+            with metrics.span("llm_call"):
+                message = llm.invoke(prompt_value, config)
+            metrics.count_llm_usage(message)
+            return message
+
+        async def acall(prompt_value, config, cache):
+            metrics.count("llm_calls", cache=cache)
+            with metrics.span("llm_call"):
+                message = await llm.ainvoke(prompt_value, config)
+            metrics.count_llm_usage(message)
+            return message
+
+        def invoke(prompt_value, config=None):
+            if self.bypassed:
+                return call(prompt_value, config, "bypass")
+            key = key_for(prompt_value)
+            cached = None if refresh(config) else self.get(key)
+            if cached is not None:
+                metrics.count("llm_calls", cache="hit")
+                return AIMessage(content=cached, response_metadata={"cache_hit": True, CACHE_KEY: key})
+            message = call(prompt_value, config, "miss")
+            self.put(key, message.content)
+            message.response_metadata[CACHE_KEY] = key
+            return message
+
+        async def ainvoke(prompt_value, config=None):
+            if self.bypassed:
+                return await acall(prompt_value, config, "bypass")
+            key = key_for(prompt_value)
+            cached = None if refresh(config) else self.get(key)
+            if cached is not None:
+                metrics.count("llm_calls", cache="hit")
+                return AIMessage(content=cached, response_metadata={"cache_hit": True, CACHE_KEY: key})
+            message = await acall(prompt_value, config, "miss")
+            self.put(key, message.content)
+            message.response_metadata[CACHE_KEY] = key
+            return message
+
+        return RunnableLambda(invoke, afunc=ainvoke, name="cached_llm")
+
+    def parsed(self, parser):
+        """
+        Returns parser as a runnable that, when parsing fails, discards the
+        cache entry of the message before re-raising, so a malformed answer
+        is asked again next time instead of replayed.
+        """
+        def invoke(message, config=None):
+            try:
+                return parser.invoke(message, config)
+            except Exception:
+                self.discard(message)
+                raise
+
+        async def ainvoke(message, config=None):
+            try:
+                return await parser.ainvoke(message, config)
+            except Exception:
+                self.discard(message)
+                raise
+
+        return RunnableLambda(invoke, afunc=ainvoke, name="cached_parse")
@@ -0,0 +1,275 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+METRICS_ENV = "BILLDESK_METRICS"
+PREFIX = "billdesk"
+# upper bounds (seconds) of the Prometheus histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+_NOOP = nullcontext()
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident memory of this process (or of its finished child
+    processes) in MB, or None where it cannot be read. The resource module
+    only exists on POSIX; elsewhere psutil is used when it is installed.
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # kilobytes on Linux, bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return round(usage.ru_maxrss / divisor, 1)
+    if children:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # peak_wset is Windows' peak working set
+    return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1)
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Per-process timing spans and counters for the pipeline stages (folder
+    scan, page render, thresholding, tesseract, LLM call, parsing,
+    validation, output writes), exported as a Prometheus text file and a
+    JSON run summary.
+
+    Off by default (metrics.enabled, or BILLDESK_METRICS=1 for one run).
+    When off, span() hands back one shared no-op context manager and
+    count() returns straight away, so instrumented code pays an attribute
+    check per call. OcrPool workers send pop() snapshots back with their
+    page texts and the parent merge()s them.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, enabled=None, prometheus_path=None, summary_path=None):
+        metrics_config = config.get(Co.METRICS, {})
+        if enabled is None:
+            enabled = metrics_config.get(Co.ENABLED, False) or os.environ.get(METRICS_ENV, "") not in ("", "0")
+        self.enabled = enabled
+        self.prometheus_path = prometheus_path or metrics_config.get(Co.PROMETHEUS_PATH,
+                                                                     ".cache/metrics/billdesk.prom")
+        self.summary_path = summary_path or metrics_config.get(Co.SUMMARY_PATH, ".cache/metrics/run_summary.json")
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    @staticmethod
+    def default():
+        with Metrics._default_lock:
+            if Metrics._default is None:
+                Metrics._default = Metrics()
+        return Metrics._default
+
+    # ------------------------
+    # Recording
+    # ------------------------
+    def span(self, stage):
+        """
+        Context manager timing one pass through stage.
+        """
+        return _Span(self, stage) if self.enabled else _NOOP
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    def count(self, name, value=1, **labels):
+        """
+        Adds value to the counter name{labels}.
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def runnable(self, stage, runnable):
+        """
+        runnable with its invoke/ainvoke timed as stage (e.g. an output
+        parser in a chain); runnable itself when metrics are off.
+        """
+        if not self.enabled:
+            return runnable
+        from langchain_core.runnables import RunnableLambda
+
+        def invoke(value, config=None):
+            with self.span(stage):
+                return runnable.invoke(value, config)
+
+        async def ainvoke(value, config=None):
+            with self.span(stage):
+                return await runnable.ainvoke(value, config)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=stage)
+
+    def count_llm_usage(self, message):
+        """
+        Token counters from a chat model response: Groq's
+        response_metadata["token_usage"], else langchain's usage_metadata.
+        """
+        if not self.enabled:
+            return
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None and completion_tokens is None:
+            usage = getattr(message, "usage_metadata", None) or {}
+            prompt_tokens = usage.get("input_tokens")
+            completion_tokens = usage.get("output_tokens")
+        self.count("llm_tokens", prompt_tokens or 0, kind="prompt")
+        self.count("llm_tokens", completion_tokens or 0, kind="completion")
+
+    # ------------------------
+    # Worker processes
+    # ------------------------
+    def pop(self):
+        """
+        Everything recorded since the last pop(), as plain data; None when
+        metrics are off.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            snapshot = {"stages": self._stages, "counters": list(self._counters.items())}
+            self._stages, self._counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        if not self.enabled or not snapshot:
+            return
+        with self._lock:
+            for stage, other in snapshot["stages"].items():
+                entry = self._stages.setdefault(
+                    stage, {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)})
+                entry["count"] += other["count"]
+                entry["sum"] += other["sum"]
+                entry["max"] = max(entry["max"], other["max"])
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], other["buckets"])]
+            for key, value in snapshot["counters"]:
+                key = (key[0], tuple(tuple(label) for label in key[1]))
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    # ------------------------
+    # Export
+    # ------------------------
+    def summary(self):
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": entry["count"],
+                    "total_seconds": round(entry["sum"], 6),
+                    "mean_ms": round(entry["sum"] / entry["count"] * 1000, 3) if entry["count"] else 0.0,
+                    "max_ms": round(entry["max"] * 1000, 3)
+                }
+                for stage, entry in sorted(self._stages.items())
+            }
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                label_text = ",".join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label_text}}}" if labels else name] = value
+        return {
+            "started_at": self.started_at,
+            "seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": counters
+        }
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+    def prometheus_text(self):
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent in each pipeline stage.",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        with self._lock:
+            for stage, entry in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, entry["buckets"]):
+                    cumulative += bucket
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{PREFIX}_{name}_total{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write(path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # per process and thread, so concurrent exports never share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        # atomic, so a textfile collector never reads half a file
+        os.replace(tmp_path, path)
+
+    def export(self):
+        """
+        Writes the Prometheus text file and the JSON run summary. Returns
+        the summary (None when metrics are off).
+        """
+        if not self.enabled:
+            return None
+        # worker daemon threads export as their jobs finish
+        with self._export_lock:
+            summary = self.summary()
+            self._write(self.prometheus_path, self.prometheus_text())
+            self._write(self.summary_path, json.dumps(summary, indent=2))
+        print(f"📊 Metrics written to {self.prometheus_path} and {self.summary_path}")
+        return summary
@@ -0,0 +1,250 @@
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from commons.llm_cache import LLMCache
+from commons.metrics import Metrics
+
+SMALL = "small"
+LARGE = "large"
+# chain input key holding the chunk of receipts ([{name: text}, ...])
+RECEIPTS_KEY = "receipts_json"
+
+
+class ModelRouter:
+    """
+    Tiered extraction: every chunk of receipts goes to a small, fast model
+    first, and only the receipts whose answer looks wrong go to the
+    configured (large) model:
+      - parse: the answer did not parse into the schema,
+      - missing: the answer has no record for the receipt,
+      - <field>: a key field (amount, date, id) came back null,
+      - whatever the extractor's suspects() callback names, i.e.
+        validation failures a misread explains (unparseable date, a name
+        or address that matches nothing).
+
+    chain() is a drop-in for prompt | model | parser, so LLMBatcher and the
+    streaming pipeline use it unchanged. Both tiers go through the LLM
+    cache. If the large model fails on receipts the small one did answer,
+    the small answer is kept. Calls, latency, tokens and cost are counted
+    per tier (cost from llm.routing.prices, USD per million tokens) for
+    this router and summed over all routers in totals().
+    """
+
+    _totals = {}
+    _totals_lock = threading.Lock()
+
+    def __init__(self, llm, prompt, parser, suspects=None, small_llm=None):
+        routing_config = config.get(Co.LLM, {}).get(Co.ROUTING, {})
+        self.enabled = routing_config.get(Co.ENABLED, False)
+        self.small_model = routing_config.get(Co.SMALL_MODEL, "llama-3.1-8b-instant")
+        self.key_fields = routing_config.get(Co.KEY_FIELDS, ["amount", "date", "id"])
+        self.prices = routing_config.get(Co.PRICES, {})
+        self.suspect_name_score = routing_config.get(Co.SUSPECT_NAME_SCORE, 40)
+        self.suspect_address_score = routing_config.get(Co.SUSPECT_ADDRESS_SCORE, 20)
+        self.prompt = prompt
+        self.parser = parser
+        self.suspects = suspects
+        # the small tier shares the large client (and its connection pool)
+        small_llm = small_llm or llm.model_copy(update={"model_name": self.small_model})
+        self.cache = LLMCache.default()
+        self.tiers = {
+            SMALL: (self._model_name(small_llm), self.cache.wrap(small_llm, prompt)),
+            LARGE: (self._model_name(llm), self.cache.wrap(llm, prompt))
+        }
+        self.stats = self._empty_stats()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _model_name(llm):
+        return getattr(llm, "model_name", None) or getattr(llm, "model", None)
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            tier: {"model": None, "calls": 0, "cache_hits": 0, "seconds": 0.0, "input_tokens": 0,
+                   "output_tokens": 0, "cost_usd": 0.0, "receipts": 0}
+            for tier in (SMALL, LARGE)
+        } | {"escalated": 0, "escalation_reasons": {}, "escalation_failed": 0}
+
+    # ------------------------
+    # Accounting
+    # ------------------------
+    @staticmethod
+    def _usage(message):
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") is not None or usage.get("completion_tokens") is not None:
+            return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+        usage = getattr(message, "usage_metadata", None) or {}
+        return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+
+    def _record(self, tier, message, seconds, receipts):
+        model = self.tiers[tier][0]
+        input_tokens, output_tokens = self._usage(message)
+        cache_hit = bool((getattr(message, "response_metadata", None) or {}).get("cache_hit"))
+        input_price, output_price = self.prices.get(model, (0.0, 0.0))
+        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+        for stats, lock in ((self.stats, self._lock), (ModelRouter._totals, ModelRouter._totals_lock)):
+            with lock:
+                if not stats:
+                    stats.update(self._empty_stats())
+                entry = stats[tier]
+                entry["model"] = model
+                entry["calls"] += 1
+                entry["cache_hits"] += cache_hit
+                entry["seconds"] += seconds
+                entry["input_tokens"] += input_tokens
+                entry["output_tokens"] += output_tokens
+                entry["cost_usd"] += cost
+                entry["receipts"] += receipts
+        Metrics.default().count("llm_tier_calls", tier=tier)
+        Metrics.default().observe(f"llm_{tier}", seconds)
+
+    def _escalation(self, reasons, failed=False):
+        for stats, lock in ((self.stats, self._lock), (ModelRouter._totals, ModelRouter._totals_lock)):
+            with lock:
+                if not stats:
+                    stats.update(self._empty_stats())
+                if failed:
+                    stats["escalation_failed"] += len(reasons)
+                    continue
+                stats["escalated"] += len(reasons)
+                for names in reasons.values():
+                    for reason in names:
+                        stats["escalation_reasons"][reason] = stats["escalation_reasons"].get(reason, 0) + 1
+        if not failed:
+            for names in reasons.values():
+                for reason in names:
+                    Metrics.default().count("llm_escalations", reason=reason)
+
+    @staticmethod
+    def _rounded(stats):
+        if not stats:
+            return {}
+        report = dict(stats)
+        for tier in (SMALL, LARGE):
+            entry = dict(stats[tier])
+            entry["seconds"] = round(entry["seconds"], 3)
+            entry["cost_usd"] = round(entry["cost_usd"], 6)
+            entry["mean_ms"] = round(entry["seconds"] / entry["calls"] * 1000, 1) if entry["calls"] else 0.0
+            report[tier] = entry
+        report["escalation_reasons"] = dict(stats["escalation_reasons"])
+        return report
+
+    def report(self):
+        with self._lock:
+            return self._rounded(self.stats)
+
+    @staticmethod
+    def totals():
+        """
+        Per-tier counts over every router in this process ({} if none ran).
+        """
+        with ModelRouter._totals_lock:
+            return ModelRouter._rounded(ModelRouter._totals)
+
+    # ------------------------
+    # Routing
+    # ------------------------
+    def escalations(self, records, chunk):
+        """
+        {receipt name: [reasons]} for the receipts of chunk the large
+        model should redo, given the small model's records.
+        """
+        names = {name for receipt in chunk for name in receipt}
+        reasons = {}
+        seen = set()
+        for record in records:
+            seen.add(record.filename)
+            missing = [field for field in self.key_fields if getattr(record, field, None) is None]
+            if missing:
+                reasons.setdefault(record.filename, []).extend(missing)
+        if self.suspects is not None and records:
+            for name, suspect in self.suspects(records).items():
+                if suspect:
+                    reasons.setdefault(name, []).extend(suspect)
+        for name in names - seen:
+            reasons.setdefault(name, []).append("missing")
+        # records under a name that is not in the chunk are left as they are
+        return {name: found for name, found in reasons.items() if name in names}
+
+    def _merge(self, small_records, large_records, escalated):
+        redone = {record.filename for record in large_records}
+        records = [record for record in small_records
+                   if record.filename not in escalated or record.filename not in redone]
+        return self.parser.pydantic_object(records + list(large_records))
+
+    def _parse(self, message):
+        try:
+            with Metrics.default().span("llm_parse"):
+                return self.parser.invoke(message).root
+        except Exception:
+            # not replayed from the cache next time
+            self.cache.discard(message)
+            raise
+
+    def _call(self, tier, value, config):
+        started = time.perf_counter()
+        message = self.tiers[tier][1].invoke(self.prompt.invoke(value), config)
+        self._record(tier, message, time.perf_counter() - started, len(value[RECEIPTS_KEY]))
+        return self._parse(message)
+
+    async def _acall(self, tier, value, config):
+        started = time.perf_counter()
+        message = await self.tiers[tier][1].ainvoke(await self.prompt.ainvoke(value), config)
+        self._record(tier, message, time.perf_counter() - started, len(value[RECEIPTS_KEY]))
+        return self._parse(message)
+
+    def _escalated_input(self, value, reasons):
+        return {**value, RECEIPTS_KEY: [receipt for receipt in value[RECEIPTS_KEY]
+                                        if any(name in reasons for name in receipt)]}
+
+    def invoke(self, value, config=None):
+        chunk = value[RECEIPTS_KEY]
+        try:
+            small_records = self._call(SMALL, value, config)
+        except Exception:
+            small_records = None
+            reasons = {name: ["parse"] for receipt in chunk for name in receipt}
+        else:
+            reasons = self.escalations(small_records, chunk)
+            if not reasons:
+                return self.parser.pydantic_object(small_records)
+
+        self._escalation(reasons)
+        try:
+            large_records = self._call(LARGE, self._escalated_input(value, reasons), config)
+        except Exception:
+            if small_records is None:
+                raise
+            self._escalation(reasons, failed=True)
+            return self.parser.pydantic_object(small_records)
+        return self._merge(small_records or [], large_records, reasons)
+
+    async def ainvoke(self, value, config=None):
+        chunk = value[RECEIPTS_KEY]
+        try:
+            small_records = await self._acall(SMALL, value, config)
+        except Exception:
+            small_records = None
+            reasons = {name: ["parse"] for receipt in chunk for name in receipt}
+        else:
+            reasons = self.escalations(small_records, chunk)
+            if not reasons:
+                return self.parser.pydantic_object(small_records)
+
+        self._escalation(reasons)
+        try:
+            large_records = await self._acall(LARGE, self._escalated_input(value, reasons), config)
+        except Exception:
+            if small_records is None:
+                raise
+            self._escalation(reasons, failed=True)
+            return self.parser.pydantic_object(small_records)
+        return self._merge(small_records or [], large_records, reasons)
+
+    def chain(self):
+        return RunnableLambda(self.invoke, afunc=self.ainvoke, name="model_router")
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+
+import pytesseract
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+_tesseract_version = None
+
+
+def tesseract_version():
+    global _tesseract_version
+    if _tesseract_version is None:
+        try:
+            _tesseract_version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _tesseract_version = "unknown"
+    return _tesseract_version
+
+
+class OcrCache:
+    """
+    Content-addressed on-disk cache of OCR text.
+
+    The key is the SHA-256 of the file bytes plus the OCR settings and the
+    tesseract version, so renaming or moving a receipt still hits, while a
+    DPI or threshold change misses. Entries are plain text files; their
+    mtime is bumped on every hit and the least recently used ones are
+    removed once the cache grows past max_mb. The entry count and size are
+    counted once (first put or stats()) and then kept up to date by put()
+    and the evictions, so stats() does not rescan the cache directory.
+    """
+
+    _default = None
+
+    def __init__(self, cache_dir=None, max_mb=None, enabled=None):
+        cache_config = config.get(Co.OCR, {}).get(Co.CACHE, {})
+        self.cache_dir = cache_dir or cache_config.get(Co.DIR, ".cache/ocr")
+        self.max_bytes = int((max_mb or cache_config.get(Co.MAX_MB, 512)) * 1024 * 1024)
+        self.enabled = cache_config.get(Co.ENABLED, True) if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._count = None
+        self._totals_lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @staticmethod
+    def file_hash(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key_for(self, file_path, settings=None):
+        from commons.FileUtils import FileUtils
+
+        key_data = {
+            "sha256": self.file_hash(file_path),
+            "settings": settings or FileUtils.ocr_settings(),
+            "tesseract": tesseract_version()
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        if not self.enabled:
+            return
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        with self._totals_lock:
+            self._load_totals()
+            existed = os.path.exists(path)
+            old_size = os.path.getsize(path) if existed else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - old_size
+            self._count += not existed
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for sub_dir in os.listdir(self.cache_dir):
+            sub_path = os.path.join(self.cache_dir, sub_dir)
+            if not os.path.isdir(sub_path):
+                continue
+            for fname in os.listdir(sub_path):
+                if not fname.endswith(".txt"):
+                    continue
+                stat = os.stat(os.path.join(sub_path, fname))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(sub_path, fname)))
+        return entries
+
+    def _load_totals(self):
+        if self._size is None or self._count is None:
+            entries = self._entries()
+            self._size = sum(size for _, size, _ in entries)
+            self._count = len(entries)
+
+    def _evict(self):
+        # the one full scan: eviction needs the entries in LRU order anyway
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        count = len(entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            os.remove(path)
+            size -= entry_size
+            count -= 1
+            self.evictions += 1
+        self._size = size
+        self._count = count
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+        self._size = 0
+        self._count = 0
+
+    def stats(self):
+        with self._totals_lock:
+            self._load_totals()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes
+        }
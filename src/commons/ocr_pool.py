@@ -0,0 +1,190 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+
+from commons.FileUtils import FileUtils
+from commons.adaptive_ocr import AdaptiveOcr
+from commons.ocr_cache import OcrCache
+from commons.receipt_segmenter import ReceiptSegmenter
+from commons.tesseract_backend import BatchCliBackend
+from commons.config_reader import config
+from commons.metrics import Metrics
+from commons.constants import Constants as Co
+
+# Last document opened by this worker process. Consecutive tasks usually hit
+# the same file, so keeping it open avoids re-parsing the PDF for every page.
+_open_doc = {"path": None, "doc": None}
+
+
+def _open(pdf_path):
+    if _open_doc["path"] != pdf_path:
+        if _open_doc["doc"] is not None:
+            _open_doc["doc"].close()
+        _open_doc["doc"] = fitz.open(pdf_path)
+        _open_doc["path"] = pdf_path
+    return _open_doc["doc"]
+
+
+def _ocr_pages(pages):
+    """
+    OCRs a group of (pdf_path, page_num, clip) pages in one call to
+    FileUtils.get_pages_text, so a batching backend gets the whole group.
+    """
+    paths = list(dict.fromkeys(pdf_path for pdf_path, _, _ in pages))
+    # the last file stays open: the next group usually starts with it
+    docs = {pdf_path: fitz.open(pdf_path) for pdf_path in paths[:-1]}
+    docs[paths[-1]] = _open(paths[-1])
+    try:
+        texts = FileUtils.get_pages_text([docs[pdf_path][page_num] for pdf_path, page_num, _ in pages],
+                                         clips=[clip for _, _, clip in pages])
+    except Exception as e:
+        # Some OCR errors (e.g. TesseractNotFoundError) cannot be unpickled in
+        # the parent, which would break the whole pool: send a plain one back
+        where = ", ".join(f"{pdf_path} page {page_num + 1}" for pdf_path, page_num, _ in pages)
+        raise RuntimeError(f"OCR failed for {where}: {type(e).__name__}: {e}") from None
+    finally:
+        for pdf_path in paths[:-1]:
+            docs[pdf_path].close()
+    # Adaptive OCR stats and stage timings live in the worker, ship them
+    # back with the texts
+    return texts, AdaptiveOcr.default().pop_records(), Metrics.default().pop()
+
+
+class OcrPool:
+    """
+    Process pool that OCRs receipts page by page.
+
+    Every page of every file (every receipt region, for documents the
+    ReceiptSegmenter splits) is a separate task, so a single multi-page scan
+    is spread over all workers instead of pinning one core. With the
+    batch_cli backend a task is a group of up to ocr.batch_size pages
+    (across files), so each worker still makes one tesseract call per
+    group. Results are put back together per receipt unit in page order,
+    and units are returned in the same sorted order as
+    FileUtils.process_folder.
+    """
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = config.get(Co.OCR, {}).get(Co.WORKERS, 0)
+        self.workers = workers or os.cpu_count() or 1
+        ocr_config = config.get(Co.OCR, {})
+        self.pages_per_task = (ocr_config.get(Co.BATCH_SIZE, 16)
+                               if ocr_config.get(Co.BACKEND) == BatchCliBackend.name else 1)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._page_records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_executor(self):
+        # the worker daemon shares one pool between its job threads
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def process_folder(self, folder_path: str):
+        return self.process_folders([folder_path])[folder_path]
+
+    def process_files(self, files):
+        """
+        OCRs the given (name, path) pairs. Returns [{unit_id: text}, ...],
+        one per receipt unit.
+        """
+        return [{unit_id: text} for texts in self.ocr_units(files) for unit_id, text in texts.items()]
+
+    def process_folders(self, folder_paths):
+        """
+        OCRs several folders in one pass over the pool.
+        Returns {folder_path: [{unit_id: text}, ...]}.
+        """
+        files = []
+        for folder_path in folder_paths:
+            for pdf_name, pdf_path in FileUtils.list_receipt_files(folder_path):
+                files.append((folder_path, pdf_name, pdf_path))
+
+        unit_texts = self.ocr_units([(pdf_name, pdf_path) for _, pdf_name, pdf_path in files])
+
+        results = {folder_path: [] for folder_path in folder_paths}
+        for (folder_path, _, _), texts in zip(files, unit_texts):
+            results[folder_path].extend({unit_id: text} for unit_id, text in texts.items())
+        return results
+
+    def pop_page_records(self):
+        """
+        Per-page adaptive OCR records collected from the workers since the
+        last call (empty in fixed mode).
+        """
+        records, self._page_records = self._page_records, []
+        return records
+
+    def ocr_units(self, files):
+        """
+        Returns {unit_id: text} for each (name, path) pair, in the order
+        given. Units already in the OCR cache are not sent to the pool.
+        """
+        cache = OcrCache.default()
+        segmenter = ReceiptSegmenter.default()
+        cache_keys = {}
+        unit_texts = []
+        tasks = []
+        for pdf_name, pdf_path in files:
+            texts = {}
+            unit_texts.append(texts)
+            with fitz.open(pdf_path) as doc:
+                units = segmenter.segment(doc, pdf_name)
+                page_count = doc.page_count
+            for unit in units:
+                unit_id, page_num, clip = unit
+                key = FileUtils.unit_cache_key(cache, pdf_path, unit)
+                cached_text = cache.get(key)
+                if cached_text is not None:
+                    texts[unit_id] = cached_text
+                    continue
+
+                print(f"📄 Processing: {pdf_path}" + (f" ({unit_id})" if page_num is not None else ""))
+                texts[unit_id] = ""
+                cache_keys[(len(unit_texts) - 1, unit_id)] = key
+                pages = range(page_count) if page_num is None else [page_num]
+                tasks.extend((len(unit_texts) - 1, unit_id, pdf_path, n, clip) for n in pages)
+
+        if not tasks:
+            return unit_texts
+
+        # batch_cli: groups of pages, but still enough groups to keep every worker busy
+        group_size = max(1, min(self.pages_per_task, -(-len(tasks) // self.workers)))
+        groups = [tasks[i:i + group_size] for i in range(0, len(tasks), group_size)]
+        chunksize = max(1, len(groups) // (self.workers * 4))
+        group_texts = self._get_executor().map(
+            _ocr_pages,
+            [[(pdf_path, page_num, clip) for _, _, pdf_path, page_num, clip in group] for group in groups],
+            chunksize=chunksize
+        )
+
+        try:
+            for group, (texts, page_records, metrics) in zip(groups, group_texts):
+                for (file_index, unit_id, _, _, _), text in zip(group, texts):
+                    unit_texts[file_index][unit_id] += text + "\n"
+                self._page_records.extend(page_records)
+                Metrics.default().merge(metrics)
+        except BrokenProcessPool:
+            # a worker died; start a fresh pool on the next call
+            self._executor = None
+            raise
+
+        for (file_index, unit_id), key in cache_keys.items():
+            cache.put(key, unit_texts[file_index][unit_id])
+        return unit_texts
@@ -0,0 +1,112 @@
+import math
+import threading
+
+import cv2
+import fitz
+import numpy as np
+
+from commons.metrics import Metrics
+
+_local = threading.local()
+
+
+class PageRenderer:
+    """
+    Renders a page straight to an 8-bit grayscale pixmap and binarizes it
+    in place for tesseract.
+
+    The pixmap samples are wrapped as a NumPy array without copying, so
+    there is no PNG encode/decode and no colour-to-gray conversion. The
+    Gaussian-mean scratch buffer used by the adaptive threshold is kept
+    between pages and only grows when a larger page comes along.
+    """
+
+    def __init__(self):
+        self._scratch = np.empty(0, dtype=np.uint8)
+        self._kernels = {}
+        self.pages = 0
+        self.allocations = 0
+        self.reuses = 0
+        self.peak_page_bytes = 0
+
+    @staticmethod
+    def default():
+        """
+        One renderer per thread, so the scratch buffer is never shared.
+        """
+        if not hasattr(_local, "renderer"):
+            _local.renderer = PageRenderer()
+        return _local.renderer
+
+    def render_gray(self, page, dpi, clip=None):
+        """
+        Returns (pixmap, array). The array is a view over pixmap.samples, so
+        the pixmap has to stay alive for as long as the array is used.
+        """
+        with Metrics.default().span("page_render"):
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+        gray = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        gray = gray.reshape(pix.height, pix.stride)[:, :pix.width]
+        return pix, gray
+
+    def _scratch_for(self, shape):
+        size = shape[0] * shape[1]
+        if self._scratch.size < size:
+            self._scratch = np.empty(size, dtype=np.uint8)
+            self.allocations += 1
+        else:
+            self.reuses += 1
+        return self._scratch[:size].reshape(shape)
+
+    def _kernel(self, block_size):
+        if block_size not in self._kernels:
+            self._kernels[block_size] = cv2.getGaussianKernel(block_size, 0, cv2.CV_64F)
+        return self._kernels[block_size]
+
+    def threshold_in_place(self, gray, block_size, c):
+        """
+        Same result as cv2.adaptiveThreshold(ADAPTIVE_THRESH_GAUSSIAN_C,
+        THRESH_BINARY): a pixel is white when it is brighter than its
+        Gaussian-weighted neighbourhood mean minus c.
+        """
+        idelta = math.ceil(c)
+        if idelta <= 0:
+            # The saturating subtract below only works for a positive delta
+            cv2.adaptiveThreshold(
+                gray, 255,
+                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY,
+                block_size, c,
+                dst=gray
+            )
+            return gray
+
+        mean = self._scratch_for(gray.shape)
+        kernel = self._kernel(block_size)
+        cv2.sepFilter2D(
+            gray, -1, kernel, kernel, dst=mean,
+            borderType=cv2.BORDER_REPLICATE | cv2.BORDER_ISOLATED
+        )
+        # mean - gray saturates at 0 for pixels brighter than the mean,
+        # which are always white for a positive delta
+        cv2.subtract(mean, gray, dst=mean)
+        cv2.compare(mean, idelta, cv2.CMP_LT, dst=gray)
+        return gray
+
+    def render_for_ocr(self, page, dpi, block_size, c, clip=None):
+        pix, gray = self.render_gray(page, dpi, clip)
+        with Metrics.default().span("threshold"):
+            self.threshold_in_place(gray, block_size, c)
+
+        self.pages += 1
+        self.peak_page_bytes = max(self.peak_page_bytes, gray.nbytes + self._scratch.nbytes)
+        return pix, gray
+
+    def stats(self):
+        return {
+            "pages": self.pages,
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+            "scratch_bytes": self._scratch.nbytes,
+            "peak_page_bytes": self.peak_page_bytes
+        }
@@ -0,0 +1,163 @@
+import re
+
+import fitz
+import numpy as np
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+UNIT_SEPARATOR = "#"
+
+
+def source_name(unit_id):
+    """
+    The receipt file a unit id such as "AugMealReceipts#p2r3" comes from.
+    """
+    return unit_id.split(UNIT_SEPARATOR, 1)[0]
+
+
+def unit_order(unit_id):
+    """
+    Sort key putting the units of a file in page/region order (p2r10 after
+    p2r9); the plain filename of an unsegmented file sorts first.
+    """
+    match = re.search(r"#p(\d+)r(\d+)$", unit_id)
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+class ReceiptSegmenter:
+    """
+    Splits a scanned document holding several receipts (e.g. a month of
+    meal bills in one PDF) into receipt units that are OCR'd, cached and
+    extracted on their own.
+
+    Every page is a unit; within a page, content is cut at horizontal
+    bands of blank rows at least min_gap points tall, and at full-width
+    rules. Bands shorter than min_height (page headers, stray marks) are
+    merged into a neighbour. Units are (unit_id, page_num, clip) with
+    unit_id "<file>#p<page>r<region>" (1-based) and clip a page rectangle.
+
+    Off by default (segmentation.enabled): band cutting cannot tell a
+    bundle of receipts from a single photo or a multi-page scan, so only
+    turn it on for folders of bundled scans. Documents with native text
+    are single receipts that may span pages (e-receipts), and are never
+    split. A document that yields a single unit keeps the plain filename
+    as its id and page_num None, i.e. it is read exactly as before.
+    """
+
+    _default = None
+
+    def __init__(self, enabled=None, dpi=None, min_gap=None, min_height=None, blank_level=None):
+        segmentation_config = config.get(Co.SEGMENTATION, {})
+        self.enabled = segmentation_config.get(Co.ENABLED, False) if enabled is None else enabled
+        self.dpi = dpi or segmentation_config.get(Co.DPI, 72)
+        self.min_gap = min_gap or segmentation_config.get(Co.MIN_GAP, 8)
+        self.min_height = min_height or segmentation_config.get(Co.MIN_HEIGHT, 60)
+        self.blank_level = blank_level or segmentation_config.get(Co.BLANK_LEVEL, 250)
+
+    @staticmethod
+    def default():
+        if ReceiptSegmenter._default is None:
+            ReceiptSegmenter._default = ReceiptSegmenter()
+        return ReceiptSegmenter._default
+
+    def settings(self):
+        """
+        Everything that changes the units of a document (part of the OCR
+        cache key of a segmented unit).
+        """
+        return {"dpi": self.dpi, "min_gap": self.min_gap, "min_height": self.min_height,
+                "blank_level": self.blank_level}
+
+    # ------------------------
+    # Page regions
+    # ------------------------
+    def _bands(self, gray):
+        """
+        (top, bottom) pixel rows of the content bands of a grayscale page.
+        """
+        ink = (gray < self.blank_level).mean(axis=1)
+        # blank rows and full-width rules both separate receipts
+        content = (ink > 0.005) & (ink < 0.95)
+        min_gap = max(1, round(self.min_gap * self.dpi / 72))
+
+        bands = []
+        top = None
+        gap = 0
+        for row, has_content in enumerate(content):
+            if has_content:
+                if top is None:
+                    top = row
+                gap = 0
+                continue
+            if top is not None:
+                gap += 1
+                if gap >= min_gap:
+                    bands.append([top, row - gap + 1])
+                    top, gap = None, 0
+        if top is not None:
+            bands.append([top, len(content) - gap])
+        return bands
+
+    def _merge_small(self, bands):
+        min_height = self.min_height * self.dpi / 72
+        merged = []
+        top = None
+        for band in bands:
+            if band[1] - band[0] < min_height:
+                # short bands (page header, filters) go with the receipt below
+                top = band[0] if top is None else top
+                continue
+            merged.append([band[0] if top is None else top, band[1]])
+            top = None
+        if top is not None:
+            # ...or, at the bottom of the page, with the one above
+            if merged:
+                merged[-1][1] = bands[-1][1]
+            else:
+                merged.append([top, bands[-1][1]])
+        return merged
+
+    def regions(self, page):
+        """
+        Page rectangles of the receipts on the page, top to bottom.
+        """
+        pix = page.get_pixmap(dpi=self.dpi, colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+        bands = self._merge_small(self._bands(gray))
+        if len(bands) <= 1:
+            return [page.rect]
+
+        scale = 72.0 / self.dpi
+        rect = page.rect
+        regions = []
+        for i, (top, bottom) in enumerate(bands):
+            # cut half way through the gaps so no ink is lost at the edges
+            y0 = 0 if i == 0 else (bands[i - 1][1] + top) / 2
+            y1 = pix.height if i == len(bands) - 1 else (bottom + bands[i + 1][0]) / 2
+            regions.append(fitz.Rect(rect.x0, rect.y0 + y0 * scale, rect.x1, rect.y0 + y1 * scale))
+        return regions
+
+    # ------------------------
+    # Documents
+    # ------------------------
+    def segment(self, doc, name):
+        """
+        Receipt units of an open document: [(unit_id, page_num, clip)],
+        clip being (x0, y0, x1, y1) or None for the whole page.
+        """
+        whole = [(name, None, None)]
+        if not self.enabled or any(page.get_text("text").strip() for page in doc):
+            return whole
+
+        units = []
+        for page in doc:
+            regions = self.regions(page)
+            for r, region in enumerate(regions, start=1):
+                clip = None if len(regions) == 1 else tuple(region)
+                units.append((f"{name}{UNIT_SEPARATOR}p{page.number + 1}r{r}", page.number, clip))
+        return units if len(units) > 1 else whole
+
+    def segment_file(self, file_path, name):
+        with fitz.open(file_path) as doc:
+            return self.segment(doc, name)
@@ -0,0 +1,216 @@
+import re
+import unicodedata
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+from entity.meal_extraction_schema import MealExtraction
+from entity.ride_extraction_schema import RideExtraction
+
+AMOUNT = r"([\d,]+(?:\.\d+)?)"
+
+
+def _amount(value):
+    return float(value.replace(",", ""))
+
+
+def _join_address(lines):
+    # punctuation is kept as printed (a trailing comma included), like the LLM does
+    address = " ".join(line.strip() for line in lines if line.strip())
+    return address or None
+
+
+class ReceiptTemplate:
+    """
+    A fixed receipt layout that can be read without the LLM.
+
+    extract() returns (fields, confidence) where confidence is the share of
+    the template's required fields that were found. Templates only claim a
+    receipt when their anchor text is present.
+    """
+
+    name = "base"
+    category = None
+    anchors = ()
+    required = ()
+
+    def applies_to(self, text):
+        return all(anchor in text for anchor in self.anchors)
+
+    def extract(self, filename, text):
+        raise NotImplementedError
+
+    def confidence(self, fields):
+        found = sum(1 for key in self.required if fields.get(key) not in (None, ""))
+        return found / len(self.required) if self.required else 0.0
+
+
+class RapidoBookingTemplate(ReceiptTemplate):
+    """
+    Rapido "Booking History" receipts (AUTO_RECEIPT_RD… / AUTORECEIPTRD…):
+    the values come first (customer, ride id, driver, vehicle, mode, time),
+    then the labels, the price, the pickup address, the disclaimer and
+    finally the drop address.
+    """
+
+    name = "rapido_booking"
+    category = "cab"
+    anchors = ("Booking History", "Selected Price", "Rapido")
+    required = ("id", "rider_name", "date", "time", "amount", "pickup_address", "drop_address")
+
+    RIDE_ID = re.compile(r"^\s*(RD\d{10,})\s*$", re.MULTILINE)
+    RIDE_TIME = re.compile(
+        r"([A-Z][a-z]{2}) (\d{1,2})(?:st|nd|rd|th) (\d{4}),\s*(\d{1,2}):(\d{2})\s*([AP]M)"
+    )
+    PRICE = re.compile(r"Selected Price\s*₹\s*" + AMOUNT)
+    PICKUP = re.compile(r"Selected Price\s*₹\s*[\d,.]+\s*\n(.*?)\nThis document is issued", re.DOTALL)
+    DROP = re.compile(r"estimated price range\s*\n(.*)", re.DOTALL)
+
+    def extract(self, filename, text):
+        fields = {"filename": filename, "service_provider": "Rapido", "ocr": text.replace("\n", "\\n")}
+        lines = text.split("\n")
+
+        ride_id = self.RIDE_ID.search(text)
+        if ride_id:
+            fields["id"] = ride_id.group(1)
+            id_line = text[:ride_id.start(1)].count("\n")
+            fields["rider_name"] = lines[id_line - 1].strip() if id_line > 0 else None
+            fields["driver_name"] = lines[id_line + 1].strip() if id_line + 1 < len(lines) else None
+
+        ride_time = self.RIDE_TIME.search(text)
+        if ride_time:
+            stamp = datetime.strptime(" ".join(ride_time.groups()), "%b %d %Y %I %M %p")
+            # day and month as the LLM writes them for this layout: the
+            # printed day ("5th") and the month number, both unpadded
+            fields.update({
+                "day": str(stamp.day),
+                "month": str(stamp.month),
+                "year": str(stamp.year),
+                "date": stamp.strftime("%d/%m/%Y"),
+                "time": stamp.strftime("%H:%M:%S")
+            })
+
+        price = self.PRICE.search(text)
+        if price:
+            fields["amount"] = _amount(price.group(1))
+
+        pickup = self.PICKUP.search(text)
+        if pickup:
+            fields["pickup_address"] = _join_address(pickup.group(1).split("\n"))
+
+        drop = self.DROP.search(text)
+        if drop:
+            fields["drop_address"] = _join_address(drop.group(1).split("\n"))
+
+        return fields, self.confidence(fields)
+
+
+class HungerBoxInvoiceTemplate(ReceiptTemplate):
+    """
+    HungerBox (Eatgood Technologies) cafeteria tax invoices.
+    """
+
+    name = "hungerbox_invoice"
+    category = "meal"
+    anchors = ("Eatgood Technologies", "Invoice No", "Bill To:")
+    required = ("id", "date", "buyer_name", "amount")
+
+    INVOICE_NO = re.compile(r"Invoice No\s*:\s*(\S+)")
+    INVOICE_DATE = re.compile(r"Invoice Date\s*:\s*(\d{4})-(\d{2})-(\d{2})")
+    BUYER = re.compile(r"Bill To:\s*\n\s*(.+)")
+    TOTAL = re.compile(r"\nTotal\s*\n\s*₹\s*" + AMOUNT)
+
+    def extract(self, filename, text):
+        fields = {"filename": filename, "ocr": text}
+
+        invoice_no = self.INVOICE_NO.search(text)
+        if invoice_no:
+            fields["id"] = invoice_no.group(1)
+
+        invoice_date = self.INVOICE_DATE.search(text)
+        if invoice_date:
+            year, month, day = invoice_date.groups()
+            fields.update({"day": day, "month": month, "year": year, "date": f"{day}/{month}/{year}"})
+
+        buyer = self.BUYER.search(text)
+        if buyer:
+            fields["buyer_name"] = buyer.group(1).strip()
+
+        total = self.TOTAL.search(text)
+        if total:
+            fields["amount"] = _amount(total.group(1))
+
+        return fields, self.confidence(fields)
+
+
+TEMPLATES = [RapidoBookingTemplate(), HungerBoxInvoiceTemplate()]
+
+SCHEMAS = {"cab": RideExtraction, "meal": MealExtraction}
+
+
+class TemplateExtractor:
+    """
+    Deterministic fast path run on OCR text before the LLM stage.
+
+    Receipts a template reads with at least min_confidence become
+    RideExtraction/MealExtraction records directly; everything else is
+    returned for the LLM chain. Counters show how much of the traffic the
+    fast path absorbs.
+    """
+
+    def __init__(self, category, templates=None, min_confidence=None, enabled=None):
+        template_config = config.get(Co.TEMPLATES, {})
+        self.category = category
+        self.templates = [t for t in (templates or TEMPLATES) if t.category == category]
+        self.min_confidence = min_confidence if min_confidence is not None \
+            else template_config.get(Co.MIN_CONFIDENCE, 1.0)
+        self.enabled = template_config.get(Co.ENABLED, True) if enabled is None else enabled
+        self.schema = SCHEMAS[category]
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_template = {}
+
+    def match(self, filename, text):
+        # PDF text keeps ligatures ("ﬁ" in "Whiteﬁeld"); the LLM writes them out
+        text = unicodedata.normalize("NFKC", text)
+        for template in self.templates:
+            if not template.applies_to(text):
+                continue
+            fields, confidence = template.extract(filename, text)
+            if confidence < self.min_confidence:
+                continue
+            try:
+                record = self.schema(**{key: fields.get(key) for key in self.schema.model_fields})
+            except ValidationError:
+                continue
+            self.hits_by_template[template.name] = self.hits_by_template.get(template.name, 0) + 1
+            return record
+        return None
+
+    def extract(self, receipts):
+        """
+        receipts: list of {name: text}. Returns (records, unmatched receipts).
+        """
+        records = []
+        unmatched = []
+        for receipt in receipts:
+            for filename, text in receipt.items():
+                record = self.match(filename, text) if self.enabled else None
+                if record is None:
+                    self.misses += 1
+                    unmatched.append({filename: text})
+                else:
+                    self.hits += 1
+                    records.append(record)
+        return records, unmatched
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "fast_path": self.hits,
+            "llm": self.misses,
+            "fast_path_share": (self.hits / total) if total else 0.0,
+            "by_template": dict(self.hits_by_template)
+        }
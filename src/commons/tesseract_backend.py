@@ -0,0 +1,189 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import cv2
+import pytesseract
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+PAGE_SEPARATOR = "\f"
+
+
+class TesseractBackend:
+    """
+    Common interface for the OCR engines behind FileUtils.
+
+    image_to_string / image_to_data take a grayscale NumPy image and mirror
+    the pytesseract functions of the same name. images_to_strings OCRs a
+    list of images; backends that can do that in one go set batch_size > 1
+    so callers know it is worth collecting pages first.
+    """
+
+    name = "base"
+    batch_size = 1
+
+    _default = None
+
+    @staticmethod
+    def create(name=None):
+        name = name or config.get(Co.OCR, {}).get(Co.BACKEND, PytesseractBackend.name)
+        backends = {
+            PytesseractBackend.name: PytesseractBackend,
+            TesserocrBackend.name: TesserocrBackend,
+            BatchCliBackend.name: BatchCliBackend
+        }
+        if name not in backends:
+            raise ValueError(f"Unknown OCR backend: {name}")
+        return backends[name]()
+
+    @staticmethod
+    def default():
+        if TesseractBackend._default is None:
+            TesseractBackend._default = TesseractBackend.create()
+        return TesseractBackend._default
+
+    def image_to_string(self, image, lang="eng"):
+        raise NotImplementedError
+
+    def image_to_data(self, image, lang="eng"):
+        return pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+    def images_to_strings(self, images, lang="eng"):
+        return [self.image_to_string(image, lang) for image in images]
+
+
+class PytesseractBackend(TesseractBackend):
+    """
+    The original path: one tesseract process per page.
+    """
+
+    name = "pytesseract"
+
+    def image_to_string(self, image, lang="eng"):
+        return pytesseract.image_to_string(image, lang=lang)
+
+
+class TesserocrBackend(TesseractBackend):
+    """
+    Keeps one tesseract engine per thread alive via tesserocr, so the
+    language data is loaded once per worker instead of once per page.
+    Needs the optional tesserocr package.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise ImportError("OCR backend 'tesserocr' needs the tesserocr package: pip install tesserocr") from e
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+
+    def _api(self, lang):
+        apis = self._local.__dict__.setdefault("apis", {})
+        if lang not in apis:
+            apis[lang] = self._tesserocr.PyTessBaseAPI(lang=lang)
+        return apis[lang]
+
+    def _set_image(self, image, lang):
+        from PIL import Image
+
+        api = self._api(lang)
+        api.SetImage(Image.fromarray(image))
+        return api
+
+    def image_to_string(self, image, lang="eng"):
+        return self._set_image(image, lang).GetUTF8Text()
+
+    def image_to_data(self, image, lang="eng"):
+        """
+        Word-level results in the same layout as pytesseract's Output.DICT
+        (only the keys AdaptiveOcr reads).
+        """
+        RIL = self._tesserocr.RIL
+        api = self._set_image(image, lang)
+        api.Recognize()
+
+        data = {key: [] for key in ("block_num", "par_num", "line_num", "word_num",
+                                    "left", "top", "width", "height", "conf", "text")}
+        block_num = par_num = line_num = word_num = 0
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+
+        while True:
+            if iterator.IsAtBeginningOf(RIL.BLOCK):
+                block_num, par_num, line_num = block_num + 1, 0, 0
+            if iterator.IsAtBeginningOf(RIL.PARA):
+                par_num, line_num = par_num + 1, 0
+            if iterator.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num, word_num = line_num + 1, 0
+            word_num += 1
+
+            box = iterator.BoundingBox(RIL.WORD)
+            if box is not None:
+                left, top, right, bottom = box
+                data["block_num"].append(block_num)
+                data["par_num"].append(par_num)
+                data["line_num"].append(line_num)
+                data["word_num"].append(word_num)
+                data["left"].append(left)
+                data["top"].append(top)
+                data["width"].append(right - left)
+                data["height"].append(bottom - top)
+                data["conf"].append(iterator.Confidence(RIL.WORD))
+                data["text"].append(iterator.GetUTF8Text(RIL.WORD) or "")
+
+            if not iterator.Next(RIL.WORD):
+                break
+        return data
+
+
+class BatchCliBackend(TesseractBackend):
+    """
+    Writes a batch of page images to a temp folder and OCRs all of them with
+    a single tesseract invocation (tesseract accepts a text file listing
+    image paths). Pages come back separated by form feeds.
+    """
+
+    name = "batch_cli"
+
+    def __init__(self):
+        self.batch_size = config.get(Co.OCR, {}).get(Co.BATCH_SIZE, 16)
+        self.tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+
+    def image_to_string(self, image, lang="eng"):
+        return self.images_to_strings([image], lang)[0]
+
+    def images_to_strings(self, images, lang="eng"):
+        if not images:
+            return []
+
+        tmp_dir = tempfile.mkdtemp(prefix="ocr_batch_")
+        try:
+            list_path = os.path.join(tmp_dir, "pages.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for i, image in enumerate(images):
+                    image_path = os.path.join(tmp_dir, f"page_{i:05d}.png")
+                    cv2.imwrite(image_path, image)
+                    f.write(image_path + "\n")
+
+            completed = subprocess.run(
+                [self.tesseract_cmd, list_path, "stdout", "-l", lang],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True
+            )
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        texts = completed.stdout.decode("utf-8").split(PAGE_SEPARATOR)
+        # tesseract ends every page with a separator, so there is one extra chunk
+        texts = texts[:len(images)]
+        texts += [""] * (len(images) - len(texts))
+        return texts
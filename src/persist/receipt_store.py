@@ -0,0 +1,319 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from commons.config_reader import config
+from commons.constants import Constants as Co
+
+MANUAL = "MANUAL"
+# conflict key column of every table, see ReceiptStore.record_key
+KEY_COLUMN = "receipt_key"
+# key prefix of migrated rows that had no id
+LEGACY = "LEGACY"
+
+# category → table layout. Columns are (column, SQL type, record field); the
+# first column holds the printed ride/bill id.
+TABLES = {
+    "cab": {
+        "table": "cab_receipts",
+        "columns": [
+            ("ride_id", "TEXT", "id"),
+            ("filename", "TEXT", "filename"),
+            ("emp_id", "TEXT", "emp_id"),
+            ("emp_name", "TEXT", "emp_name"),
+            ("emp_month", "TEXT", "emp_month"),
+            ("client", "TEXT", "client"),
+            ("rider_name", "TEXT", "rider_name"),
+            ("driver_name", "TEXT", "driver_name"),
+            ("date", "DATE", "date"),
+            ("time", "TEXT", "time"),
+            ("pickup_address", "TEXT", "pickup_address"),
+            ("drop_address", "TEXT", "drop_address"),
+            ("amount", "NUMERIC", "amount"),
+            ("distance", "NUMERIC", "distance_km"),
+            ("service_provider", "TEXT", "service_provider"),
+            ("ocr", "TEXT", "ocr"),
+            ("validation", "JSONB", "validation"),
+        ]
+    },
+    "meal": {
+        "table": "meal_receipts",
+        "columns": [
+            ("bill_id", "TEXT", "id"),
+            ("filename", "TEXT", "filename"),
+            ("emp_id", "TEXT", "emp_id"),
+            ("emp_name", "TEXT", "emp_name"),
+            ("emp_month", "TEXT", "emp_month"),
+            ("client", "TEXT", "client"),
+            ("buyer_name", "TEXT", "buyer_name"),
+            ("date", "DATE", "date"),
+            ("amount", "NUMERIC", "amount"),
+            ("ocr", "TEXT", "ocr"),
+            ("validation", "JSONB", "validation"),
+        ]
+    }
+}
+
+
+class ReceiptStore:
+    """
+    Bulk, idempotent Postgres persistence for extracted cab and meal receipts.
+
+    Rows go in with multi-row INSERT ... ON CONFLICT (receipt_key) DO UPDATE
+    through execute_values, one transaction per batch_size rows, on
+    connections taken from a pool. Loading the same output file twice leaves
+    the table unchanged. A receipt is keyed by employee and printed id, so
+    two employees claiming the same ride get a row each (and a warning).
+    Receipts without a printed id get a random MANUAL-<uuid> id from
+    validation; those are keyed by employee, month, receipt unit and
+    position in the unit, so reruns still hit the same row. Rows of the old
+    id-only layout keep a key of their own and are taken over by the first
+    load that carries their id. The validation result is stored as JSONB.
+    src/benchmark/receipt_store_check.py checks that a second load changes
+    nothing.
+    """
+
+    _default = None
+
+    def __init__(self, db_config=None):
+        db_config = db_config or config.get(Co.DATABASE, {})
+        self.connect_args = {
+            "host": db_config.get(Co.HOST, "localhost"),
+            "port": db_config.get(Co.PORT, 5432),
+            "dbname": db_config.get(Co.NAME, "postgres"),
+            "user": db_config.get(Co.USER, "postgres"),
+            "password": os.environ.get("PGPASSWORD", db_config.get(Co.PASSWORD, "")),
+        }
+        self.min_connections = db_config.get(Co.MIN_CONNECTIONS, 1)
+        self.max_connections = db_config.get(Co.MAX_CONNECTIONS, 4)
+        self.batch_size = db_config.get(Co.BATCH_SIZE, 500)
+        self._pool = None
+        self._schema_ready = set()
+
+    @staticmethod
+    def default():
+        if ReceiptStore._default is None:
+            ReceiptStore._default = ReceiptStore()
+        return ReceiptStore._default
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadedConnectionPool(self.min_connections, self.max_connections, **self.connect_args)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    # ------------------------
+    # Schema
+    # ------------------------
+    def ensure_schema(self, category):
+        """
+        Creates the category table, or adds missing columns and the unique
+        key to an existing one. Older tables were keyed by ride_id/bill_id
+        alone; their rows get a receipt_key and that key is dropped.
+        """
+        if category in self._schema_ready:
+            return
+        spec = TABLES[category]
+        table = spec["table"]
+        id_column = spec["columns"][0][0]
+        conn = self._get_pool().getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({KEY_COLUMN} TEXT PRIMARY KEY)")
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {KEY_COLUMN} TEXT")
+                for column, sql_type, _ in spec["columns"]:
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {sql_type}")
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now()")
+                # rows of the old id-only key: <emp_id>:<id>, or the id alone
+                # for old MANUAL rows and rows loaded without an employee
+                # (upsert moves those onto the new key, see _adopt_legacy);
+                # rows without an id, or sharing a key, are told apart by row
+                legacy_key = (f"CASE WHEN {id_column} IS NULL THEN '{LEGACY}' WHEN emp_id IS NULL"
+                              f" OR {id_column} LIKE %s THEN {id_column} ELSE emp_id || ':' || {id_column} END")
+                cur.execute(f"UPDATE {table} SET {KEY_COLUMN} = legacy.key FROM ("
+                            f"SELECT ctid AS row_id, {legacy_key} || CASE WHEN {id_column} IS NULL OR"
+                            f" ROW_NUMBER() OVER (PARTITION BY {legacy_key}) > 1 THEN '#' || ctid::text ELSE ''"
+                            f" END AS key FROM {table} WHERE {KEY_COLUMN} IS NULL) legacy"
+                            f" WHERE {table}.ctid = legacy.row_id",
+                            (MANUAL + "-%", MANUAL + "-%"))
+                cur.execute(f"DROP INDEX IF EXISTS {table}_{id_column}_key")
+                cur.execute(f"SELECT 1 FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid"
+                            f" AND a.attnum = ANY(i.indkey) WHERE i.indrelid = '{table}'::regclass"
+                            f" AND i.indisprimary AND a.attname = %s", (id_column,))
+                if cur.fetchone():
+                    cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey")
+                cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{KEY_COLUMN} ON {table} ({KEY_COLUMN})")
+        finally:
+            self._get_pool().putconn(conn)
+        self._schema_ready.add(category)
+
+    # ------------------------
+    # Rows
+    # ------------------------
+    @staticmethod
+    def _date(value):
+        try:
+            return datetime.strptime(value, "%d/%m/%Y").date()
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def record_key(record, position=0):
+        """
+        <emp_id>:<printed id>, or for receipts without one
+        MANUAL:<emp_id>:<emp_month>:<filename>[:<position>], where filename is
+        the receipt unit (file#pXrY for segmented scans) and position numbers
+        the records of one unit. None when the record has no id at all.
+        """
+        record_id = record.get("id")
+        if not record_id:
+            return None
+        if str(record_id).startswith(MANUAL + "-"):
+            key = f"{MANUAL}:{record.get('emp_id')}:{record.get('emp_month')}:{record.get('filename')}"
+            return key + (f":{position}" if position else "")
+        return f"{record.get('emp_id')}:{record_id}"
+
+    @staticmethod
+    def keyed(records):
+        """
+        (key, record) for every record with an id, MANUAL records numbered
+        by their position in the receipt unit.
+        """
+        positions = {}
+        for record in records:
+            manual_key = ReceiptStore.record_key(record)
+            position = 0
+            if manual_key is not None and manual_key.startswith(MANUAL + ":"):
+                position = positions.get(manual_key, 0)
+                positions[manual_key] = position + 1
+            key = ReceiptStore.record_key(record, position)
+            if key is None:
+                print(f"⚠️ Skipping {record.get('filename')}: no id")
+                continue
+            yield key, record
+
+    @staticmethod
+    def to_rows(category, records):
+        """
+        Table rows for the records, one per key (the last record wins, as a
+        statement cannot update the same row twice). Records without an id
+        are skipped; a printed id claimed by several employees is reported.
+        """
+        rows = {}
+        claimed_by = {}
+        for key, record in ReceiptStore.keyed(records):
+            if not key.startswith(MANUAL + ":"):
+                claimed_by.setdefault(str(record["id"]), set()).add(record.get("emp_id"))
+            row = [key]
+            for _, sql_type, field in TABLES[category]["columns"]:
+                value = key if field == "id" and key.startswith(MANUAL + ":") else record.get(field)
+                if sql_type == "DATE":
+                    value = ReceiptStore._date(value)
+                elif sql_type == "JSONB":
+                    value = Json(value) if value is not None else None
+                row.append(value)
+            rows[key] = tuple(row)
+
+        for record_id, employees in claimed_by.items():
+            if len(employees) > 1:
+                print(f"⚠️ {TABLES[category]['table']}: id {record_id} claimed by {sorted(employees, key=str)}")
+        return list(rows.values())
+
+    def _adopt_legacy(self, cur, table, keys):
+        """
+        Moves rows that ensure_schema keyed by their id alone (loaded
+        without an employee, or old MANUAL rows) onto the key of the
+        record, so reloading that data updates them instead of adding a
+        copy. keys are (key, id) pairs.
+        """
+        execute_values(cur, f"UPDATE {table} SET {KEY_COLUMN} = v.key FROM (VALUES %s) AS v(key, legacy)"
+                            f" WHERE {table}.{KEY_COLUMN} = v.legacy AND NOT EXISTS"
+                            f" (SELECT 1 FROM {table} t WHERE t.{KEY_COLUMN} = v.key)",
+                       keys, page_size=self.batch_size)
+
+    def upsert(self, category, records):
+        """
+        Inserts or updates the records. Returns {"rows", "seconds", "rows_per_second"}.
+        """
+        self.ensure_schema(category)
+        spec = TABLES[category]
+        columns = [KEY_COLUMN] + [column for column, _, _ in spec["columns"]]
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[1:])
+        sql = (f"INSERT INTO {spec['table']} ({', '.join(columns)}) VALUES %s "
+               f"ON CONFLICT ({KEY_COLUMN}) DO UPDATE SET {updates}, updated_at = now()")
+
+        rows = self.to_rows(category, records)
+        legacy_ids = {key: str(record["id"]) for key, record in self.keyed(records)}
+        started = time.perf_counter()
+        conn = self._get_pool().getconn()
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                # one transaction per batch: a failure rolls back only that batch
+                with conn, conn.cursor() as cur:
+                    self._adopt_legacy(cur, spec["table"], [(row[0], legacy_ids[row[0]]) for row in batch])
+                    execute_values(cur, sql, batch, page_size=self.batch_size)
+        finally:
+            self._get_pool().putconn(conn)
+
+        seconds = time.perf_counter() - started
+        return {
+            "rows": len(rows),
+            "seconds": seconds,
+            "rows_per_second": len(rows) / seconds if seconds else 0.0
+        }
+
+    def upsert_files(self, category, paths):
+        """
+        Loads extractor output files (JSON lists of records) and upserts them
+        together.
+        """
+        records = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                records.extend(json.load(f))
+        stats = self.upsert(category, records)
+        print(f"🐘 {TABLES[category]['table']}: {stats['rows']} rows from {len(paths)} files in "
+              f"{stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+        return stats
+
+    @staticmethod
+    def output_files(output_dir):
+        """
+        Extractor output files in src/model_output/<category>/<model>
+        (the valid_bills/invalid_bills folders are skipped).
+        """
+        if not os.path.isdir(output_dir):
+            return []
+        return [os.path.join(output_dir, name) for name in sorted(os.listdir(output_dir))
+                if os.path.isfile(os.path.join(output_dir, name))]
+
+
+def main(category, output_category, argv):
+    """
+    Entry point of the save_to_database_* scripts: upserts the given output
+    files, or every output file of the configured model.
+    """
+    paths = argv or ReceiptStore.output_files(
+        os.path.join("src/model_output", output_category, config[Co.LLM][Co.MODEL]))
+    if not paths:
+        print("No output files to load")
+        return
+    store = ReceiptStore.default()
+    try:
+        store.upsert_files(category, paths)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        raise
+    finally:
+        store.close()
+    print("All records inserted successfully!")
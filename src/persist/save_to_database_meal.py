@@ -0,0 +1,11 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from persist.receipt_store import main
+
+## Run command : python src/persist/save_to_database_meal.py [output_json ...]
+## Without arguments every meal output file of the configured model is loaded
+
+if __name__ == "__main__":
+    main("meal", "meal", sys.argv[1:])